@@ -0,0 +1,218 @@
+"""Time and memory-profile every stage of the churn clustering pipeline.
+
+Synthetic churn-shaped exports are generated at each requested size by
+resampling rows of the bundled churn_clean.csv (with jitter on the
+continuous columns), so the 19 clustering columns keep their marginal
+distributions and correlations.  Each stage is run ``--repeat`` times with
+tracemalloc off and the minimum and median wall times recorded; its peak
+traced allocation comes from one more run under tracemalloc, since tracing
+slows allocation-heavy code unevenly.  The run is appended to a JSON history
+keyed by git commit.  Compare runs with ``compare.py``.
+
+The ``pca``, ``pca_transform`` and ``plot_*`` stages time this package's
+Projection and render code.  The ``*_code_py`` stages time what code.py does
+for the same step (sklearn's PCA and a pandas parallel_coordinates line per
+row) as the baseline; the pandas plots run once and only up to
+PANDAS_PLOT_LIMIT rows.
+
+    python benchmarks/bench_pipeline.py --sizes 10000 100000
+"""
+
+import argparse
+import gc
+import json
+import os
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.dirname(HERE))
+
+from churn_clustering import COLUMNS, ingest  # noqa: E402
+
+SIZES = [10_000, 100_000, 1_000_000, 10_000_000]
+SOURCE = os.path.join(os.path.dirname(HERE), 'churn_clean.csv')
+REPEAT = 5
+# Exact silhouette is quadratic in the row count; skip it past this size
+EXACT_LIMIT = 20_000
+# code.py's parallel coordinates draw one artist per row and take about 35 s at this size
+PANDAS_PLOT_LIMIT = 10_000
+
+
+def synthesize(n_rows, path, seed=0, chunksize=500_000):
+    # Resample real rows in chunks and jitter the non-integer columns
+    base = pd.read_csv(SOURCE, usecols=[ingest.INDEX] + COLUMNS)[COLUMNS]
+    integer = [c for c in COLUMNS if (base[c] % 1 == 0).all()]
+    std = base.std()
+    rng = np.random.default_rng(seed)
+    with open(path, 'w') as f:
+        for start in range(0, n_rows, chunksize):
+            size = min(chunksize, n_rows - start)
+            chunk = base.iloc[rng.integers(len(base), size=size)].reset_index(drop=True)
+            for c in COLUMNS:
+                if c not in integer:
+                    chunk[c] = chunk[c] + rng.normal(0, 0.05 * std[c], size)
+            chunk.insert(0, ingest.INDEX, np.arange(start + 1, start + size + 1))
+            chunk.to_csv(f, index=False, header=start == 0)
+
+
+def _rss():
+    # Peak resident set size of this process so far, in bytes
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def measure(fn, repeat=REPEAT):
+    """Time ``repeat`` untraced runs of ``fn``, then trace one for memory; returns the last result and figures.
+
+    ``seconds`` is the fastest run, the usual estimate of the cost without
+    scheduling noise; ``median_seconds`` shows the spread.
+    """
+    walls, cpus = [], []
+    rss_before = _rss()
+    for _ in range(repeat):
+        gc.collect()
+        wall, cpu = time.perf_counter(), time.process_time()
+        result = fn()
+        walls.append(time.perf_counter() - wall)
+        cpus.append(time.process_time() - cpu)
+        del result
+    rss_growth = max(_rss() - rss_before, 0)
+    gc.collect()
+    tracemalloc.start()
+    result = fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, {'seconds': min(walls), 'median_seconds': float(np.median(walls)), 'cpu_seconds': min(cpus),
+                    'repeats': repeat, 'peak_traced_bytes': peak, 'rss_growth_bytes': rss_growth}
+
+
+def pandas_parallel_clusters(X_scaled, labels, columns, k):
+    # code.py's display_parallel_coordinates: every cluster's rows on each cluster's subplot
+    import matplotlib.pyplot as plt
+    from matplotlib.colors import to_rgba
+    from pandas.plotting import parallel_coordinates
+
+    df = pd.DataFrame(X_scaled, columns=columns)
+    df['cluster'] = labels
+    points = [df[df.cluster == i] for i in range(k)]
+    fig = plt.figure(figsize=(16, 15))
+    for i in range(k):
+        plt.subplot(k, 1, i + 1)
+        for j, c in enumerate(points):
+            if i != j:
+                parallel_coordinates(c, 'cluster', color=[to_rgba('C{}'.format(j), 0.2)])
+        parallel_coordinates(points[i], 'cluster', color=[to_rgba('C{}'.format(i), 0.5)])
+    return fig
+
+
+def pandas_parallel_centroids(centers, columns):
+    # code.py's display_parallel_coordinates_centroids
+    import matplotlib.pyplot as plt
+    from pandas.plotting import parallel_coordinates
+
+    df = pd.DataFrame(centers, columns=columns)
+    df['cluster'] = df.index
+    fig = plt.figure(figsize=(16, 5))
+    parallel_coordinates(df, 'cluster', color=['C{}'.format(i) for i in range(len(df))])
+    return fig
+
+
+def run_size(path, n_rows, random_state=0, repeat=REPEAT):
+    from sklearn.cluster import KMeans
+    from sklearn.decomposition import PCA
+    from sklearn.metrics import silhouette_score
+    from sklearn.preprocessing import StandardScaler
+
+    import matplotlib
+    matplotlib.use('Agg')
+    import matplotlib.pyplot as plt
+    from churn_clustering import render, silhouette
+    from churn_clustering.projection import Projection
+    from churn_clustering.sweep import sweep
+
+    stages = {}
+
+    def stage(name, fn, repeat=repeat):
+        result, stats = measure(fn, repeat)
+        stages[name] = stats
+        print('  {:<32} {:>9.3f}s  (median {:.3f}s)  {:>8.1f} MiB'.format(
+            name, stats['seconds'], stats['median_seconds'], stats['peak_traced_bytes'] / 2 ** 20))
+        return result
+
+    stage('csv_read', lambda: pd.read_csv(path, index_col=[0]))
+    X = stage('ingest', lambda: ingest.load_matrix(path, cache_dir=None)[1])
+    X_scaled = stage('standard_scaler', lambda: StandardScaler().fit(X).transform(X))
+    stage('sweep_k1_10', lambda: sweep(X_scaled, range(1, 11), n_jobs=1, random_state=random_state))
+    kmeans = stage('fit_k4', lambda: KMeans(n_clusters=4, random_state=random_state).fit(X_scaled))
+    labels = kmeans.labels_
+    if n_rows <= EXACT_LIMIT:
+        stage('silhouette_score', lambda: silhouette_score(X_scaled, labels))
+    stage('silhouette_sampled', lambda: silhouette.silhouette_sampled(X_scaled, labels, random_state=random_state))
+    stage('silhouette_simplified', lambda: silhouette.silhouette_simplified(X_scaled, labels, kmeans.cluster_centers_))
+    projection = stage('pca', lambda: Projection.fit(X_scaled))
+    stage('pca_transform', lambda: projection.transform(X_scaled, kmeans.cluster_centers_))
+    pca = stage('pca_code_py', lambda: PCA(n_components=2).fit(X_scaled))
+    stage('pca_transform_code_py', lambda: (pca.transform(X_scaled), pca.transform(kmeans.cluster_centers_)))
+
+    def plot(fig):
+        fig.savefig(os.devnull, format='png')
+        plt.close(fig)
+
+    stage('plot_parallel_clusters', lambda: plot(render.parallel_coordinates(X_scaled, labels, COLUMNS)))
+    stage('plot_parallel_centroids', lambda: plot(render.parallel_coordinates_centroids(kmeans.cluster_centers_,
+                                                                                        COLUMNS)))
+    if n_rows <= PANDAS_PLOT_LIMIT:
+        stage('plot_parallel_clusters_code_py', lambda: plot(pandas_parallel_clusters(X_scaled, labels, COLUMNS, 4)),
+              repeat=1)
+    stage('plot_parallel_centroids_code_py', lambda: plot(pandas_parallel_centroids(kmeans.cluster_centers_,
+                                                                                   COLUMNS)))
+    return stages
+
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=HERE,
+                                       stderr=subprocess.DEVNULL).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--workdir', default=os.path.join(HERE, 'data'), help='where synthetic CSVs are kept')
+    parser.add_argument('--history', default=os.path.join(HERE, 'history.json'))
+    parser.add_argument('--label', default=None, help='name for this run (defaults to the git commit)')
+    parser.add_argument('--repeat', type=int, default=REPEAT, help='untraced timing runs per stage')
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.workdir, exist_ok=True)
+    run = {'commit': git_commit(), 'label': args.label, 'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+           'python': sys.version.split()[0], 'numpy': np.__version__, 'sizes': {}}
+    for n_rows in args.sizes:
+        path = os.path.join(args.workdir, 'churn_{}.csv'.format(n_rows))
+        if not os.path.exists(path):
+            print('generating {} rows'.format(n_rows))
+            synthesize(n_rows, path)
+        print('{} rows'.format(n_rows))
+        run['sizes'][str(n_rows)] = run_size(path, n_rows, repeat=args.repeat)
+
+    history = []
+    if os.path.exists(args.history):
+        with open(args.history) as f:
+            history = json.load(f)
+    history.append(run)
+    with open(args.history, 'w') as f:
+        json.dump(history, f, indent=1)
+    print('appended run {} to {}'.format(run['label'] or run['commit'], args.history))
+
+
+if __name__ == '__main__':
+    main()
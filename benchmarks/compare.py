@@ -0,0 +1,71 @@
+"""Compare two benchmark runs from the JSON history and flag regressions.
+
+By default the last run is compared with the one before it; ``--base`` and
+``--head`` select runs by commit or label.  A stage regresses when it is
+slower by more than ``--threshold`` (relative) and ``--min-seconds``
+(absolute), or when its peak traced memory grows by more than the
+threshold.  Times are each stage's fastest repeat.  The exit status is 1 if
+anything regressed.
+
+    python benchmarks/compare.py --threshold 0.1
+"""
+
+import argparse
+import json
+import os
+import sys
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+
+def find(history, name):
+    for run in reversed(history):
+        if name in (run.get('commit'), run.get('label')):
+            return run
+    raise SystemExit('no run named {!r} in history'.format(name))
+
+
+def compare(base, head, threshold=0.1, min_seconds=0.05):
+    """Return rows of (size, stage, base s, head s, time ratio, memory ratio, regressed)."""
+    rows = []
+    for size, stages in head['sizes'].items():
+        for stage, stats in stages.items():
+            before = base['sizes'].get(size, {}).get(stage)
+            if before is None:
+                continue
+            ratio = stats['seconds'] / before['seconds'] if before['seconds'] else float('inf')
+            memory = stats['peak_traced_bytes'] / before['peak_traced_bytes'] if before['peak_traced_bytes'] else 1.0
+            slower = ratio > 1 + threshold and stats['seconds'] - before['seconds'] > min_seconds
+            rows.append((int(size), stage, before['seconds'], stats['seconds'], ratio, memory,
+                         slower or memory > 1 + threshold))
+    return sorted(rows)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--history', default=os.path.join(HERE, 'history.json'))
+    parser.add_argument('--base')
+    parser.add_argument('--head')
+    parser.add_argument('--threshold', type=float, default=0.1)
+    parser.add_argument('--min-seconds', type=float, default=0.05)
+    args = parser.parse_args(argv)
+
+    with open(args.history) as f:
+        history = json.load(f)
+    if len(history) < 2 and not (args.base and args.head):
+        raise SystemExit('need at least two runs to compare')
+    base = find(history, args.base) if args.base else history[-2]
+    head = find(history, args.head) if args.head else history[-1]
+
+    print('{} -> {}'.format(base.get('label') or base['commit'], head.get('label') or head['commit']))
+    print('{:>10} {:<32} {:>10} {:>10} {:>7} {:>7}'.format('rows', 'stage', 'base s', 'head s', 'time', 'mem'))
+    regressed = False
+    for size, stage, before, after, ratio, memory, flag in compare(base, head, args.threshold, args.min_seconds):
+        regressed |= flag
+        print('{:>10} {:<32} {:>10.3f} {:>10.3f} {:>6.2f}x {:>6.2f}x{}'.format(
+            size, stage, before, after, ratio, memory, '  REGRESSION' if flag else ''))
+    return 1 if regressed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+"""Production building blocks for the churn k-means analysis in ``code.py``.
+
+The notebook export stays as the narrative record of the analysis; the
+modules in this package carry the same steps in a form that scales past the
+bundled 10k-row data set.  Submodules are imported explicitly so that
+importing the package itself stays cheap.
+"""
+
+# The 19 continuous variables used for clustering, in the order used by code.py
+COLUMNS = ['Population', 'Children', 'Age', 'Income', 'Outage_sec_perweek', 'Email', 'Contacts',
+           'Yearly_equip_failure', 'Tenure', 'MonthlyCharge', 'Bandwidth_GB_Year', 'Item1', 'Item2',
+           'Item3', 'Item4', 'Item5', 'Item6', 'Item7', 'Item8']
@@ -0,0 +1,127 @@
+"""Content-addressed on-disk artifact cache with LRU size eviction."""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+MISSING = object()
+
+
+def fingerprint(*parts):
+    """Stable hex digest of arrays, strings, numbers and JSON-able containers."""
+    h = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        if isinstance(part, np.ndarray):
+            part = np.ascontiguousarray(part)
+            h.update(b'nd' + part.dtype.str.encode() + repr(part.shape).encode())
+            # Hash large arrays in slices so no contiguous bytes copy is needed
+            flat = part.reshape(-1).view(np.uint8)
+            for start in range(0, len(flat), 1 << 24):
+                h.update(flat[start:start + (1 << 24)])
+        elif isinstance(part, bytes):
+            h.update(b'b' + part)
+        else:
+            h.update(b'j' + json.dumps(part, sort_keys=True, default=repr).encode())
+        h.update(b'\x00')
+    return h.hexdigest()
+
+
+def file_identity(path):
+    # A file identified by its absolute path, size and modification time, without reading it
+    stat = os.stat(path)
+    return fingerprint(os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+
+class ArtifactCache:
+    """Pickled artifacts stored as ``<key>.pkl`` under ``directory``.
+
+    Reads refresh an entry's modification time; after each write the oldest
+    entries are evicted until the total size is at most ``max_bytes``.  An
+    artifact larger than ``max_bytes`` on its own is not stored, so it cannot
+    flush everything else out.
+    """
+
+    def __init__(self, directory='.cache/artifacts', max_bytes=2 * 1024 ** 3):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, key + '.pkl')
+
+    def get(self, key, default=MISSING):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            self.misses += 1
+            return default
+        except Exception:
+            # Truncated, or pickled from classes that have since changed: drop it and recompute
+            self.misses += 1
+            self._remove(path)
+            return default
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            # Evicted by another writer since it was read
+            pass
+        self.hits += 1
+        return value
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+
+    def put(self, key, value):
+        """Store ``value``; returns False if it alone is over budget and was dropped."""
+        fd, tmp = tempfile.mkstemp(dir=self.directory, prefix='.tmp-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+            if os.path.getsize(tmp) > self.max_bytes:
+                os.unlink(tmp)
+                return False
+            os.replace(tmp, self._path(key))
+        except BaseException:
+            if os.path.exists(tmp):
+                os.unlink(tmp)
+            raise
+        self.evict()
+        return True
+
+    def __contains__(self, key):
+        return os.path.exists(self._path(key))
+
+    def entries(self):
+        # (mtime, size, path) for every stored artifact, oldest first
+        found = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                found.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        return sorted(found)
+
+    def evict(self):
+        entries = self.entries()
+        total = sum(size for _, size, _ in entries)
+        # Never evict the newest entry, even if it alone exceeds the budget
+        for _, size, path in entries[:-1]:
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def clear(self):
+        for _, _, path in self.entries():
+            os.unlink(path)
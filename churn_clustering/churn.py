@@ -0,0 +1,107 @@
+"""Churn by cluster, as compact tables instead of a count plot.
+
+code.py parses churn_clean.csv a second time to attach the labels to the
+raw records and draws ``sns.countplot(x="Churn", hue="cluster")`` over every
+row.  Here Churn and the categorical columns come from the ingest code cache
+(``ingest.load_codes``), aligned with the labels by row order, and every
+table is a single ``np.bincount`` over ``cluster * n_levels + code``:
+linear in the number of customers, with no groupby or Python-level loop over
+rows.
+
+    tables = churn.report(labels, 'churn_clean.csv')
+    print(churn.format_report(tables))
+"""
+
+import numpy as np
+import pandas as pd
+from scipy.stats import norm
+
+from . import ingest
+
+CHURN = 'Churn'
+CATEGORICAL = ['Contract', 'InternetService', 'PaymentMethod', 'Area', 'Marital', 'Gender']
+
+
+def wilson_interval(successes, n, confidence=0.95):
+    """Wilson score interval for binomial proportions; NaN where ``n`` is 0."""
+    successes = np.asarray(successes, dtype=np.float64)
+    n = np.asarray(n, dtype=np.float64)
+    z = norm.ppf(0.5 + confidence / 2)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        p = successes / n
+        denominator = 1 + z ** 2 / n
+        centre = (p + z ** 2 / (2 * n)) / denominator
+        half = z * np.sqrt(p * (1 - p) / n + z ** 2 / (4 * n ** 2)) / denominator
+    return centre - half, centre + half
+
+
+def _counts(labels, codes, k, n_levels):
+    # (k, n_levels) contingency table in one bincount; missing codes (-1) are dropped
+    present = codes >= 0
+    flat = labels[present].astype(np.int64) * n_levels + codes[present]
+    return np.bincount(flat, minlength=k * n_levels).reshape(k, n_levels)
+
+
+def churn_by_cluster(labels, churned, k=None, confidence=0.95):
+    """Customers, churners, churn rate and its Wilson interval per cluster.
+
+    ``churned`` is a boolean array aligned with ``labels``; a final ``all``
+    row covers every customer.
+    """
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if k is None else k
+    customers = np.bincount(labels, minlength=k)
+    churners = np.bincount(labels, weights=np.asarray(churned, dtype=np.float64), minlength=k).astype(np.int64)
+    customers = np.append(customers, customers.sum())
+    churners = np.append(churners, churners.sum())
+    low, high = wilson_interval(churners, customers, confidence)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = churners / customers
+    index = pd.Index([str(c) for c in range(k)] + ['all'], name='cluster')
+    return pd.DataFrame({'customers': customers, 'share': customers / customers[-1], 'churned': churners,
+                         'churn_rate': rate, 'low': low, 'high': high}, index=index)
+
+
+def breakdown(labels, codes, levels, k=None, normalize=True):
+    """Cluster-by-level table of one categorical column.
+
+    With ``normalize`` each row holds the share of the cluster's customers in
+    each level; otherwise raw counts.  Levels are sorted by name.
+    """
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if k is None else k
+    table = _counts(labels, np.asarray(codes), k, len(levels)).astype(np.float64)
+    if normalize:
+        totals = table.sum(axis=1, keepdims=True)
+        table = np.divide(table, totals, out=np.full_like(table, np.nan), where=totals > 0)
+    frame = pd.DataFrame(table, index=pd.Index(range(k), name='cluster'), columns=levels)
+    return frame[sorted(levels)]
+
+
+def report(labels, path='churn_clean.csv', categorical=CATEGORICAL, cache_dir='.cache/ingest', confidence=0.95,
+           k=None):
+    """Churn table and one breakdown per categorical column for ``labels``.
+
+    The text columns are read once into the ingest cache and memory-mapped
+    after that.  Returns ``{'churn': DataFrame, column: DataFrame, ...}``.
+    """
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if k is None else k
+    columns = [CHURN] + [c for c in categorical if c != CHURN]
+    index, data = ingest.load_codes(path, columns, cache_dir)
+    if len(index) != len(labels):
+        raise ValueError('{} has {} rows but {} labels were given'.format(path, len(index), len(labels)))
+    codes, levels = data[CHURN]
+    churned = np.asarray(codes) == levels.index('Yes') if 'Yes' in levels else np.zeros(len(labels), dtype=bool)
+    tables = {'churn': churn_by_cluster(labels, churned, k, confidence)}
+    for column in columns[1:]:
+        tables[column] = breakdown(labels, *data[column], k=k)
+    return tables
+
+
+def format_report(tables, digits=3):
+    """Render the tables from ``report`` as plain text."""
+    parts = []
+    for name, table in tables.items():
+        parts.append('{}\n{}'.format(name, table.to_string(float_format=lambda v: '{:.{}f}'.format(v, digits))))
+    return '\n\n'.join(parts)
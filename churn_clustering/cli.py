@@ -0,0 +1,322 @@
+"""Headless command-line entry point: ``python -m churn_clustering <command>``.
+
+Commands::
+
+    prepare   standardize the clustering columns and export them as .npy
+    sweep     fit k over a range and print inertia / silhouette per k
+    select    recommend k from the sweep with a justification table
+    fit       fit the final model and save it for scoring (``-k auto`` selects k)
+    score     label a CSV of customers with a saved model
+    serve     run the local scoring server
+    coreset   compare a fit on a weighted coreset with a fit on every row
+    churn     churn rate and categorical mix per cluster, as tables
+    report    render the analysis figures to files
+
+Only argparse is imported at startup; each command imports what it needs, so
+``score`` loads NumPy and the model and nothing else.  All paths are options;
+``--prepared DIR`` makes a command memory-map the output of ``prepare``
+instead of reading the CSV.
+"""
+
+import argparse
+import os
+import sys
+
+
+def _pipeline(args, **overrides):
+    import numpy as np
+
+    from .cache import ArtifactCache
+    from .pipeline import Pipeline
+    options = dict(path=args.input, cache=ArtifactCache(os.path.join(args.cache_dir, 'artifacts')),
+                   ingest_cache=os.path.join(args.cache_dir, 'ingest'),
+                   random_state=args.seed, n_jobs=args.jobs, engine=args.engine,
+                   dtype=np.float32 if args.float32 else np.float64, prepared=args.prepared,
+                   coreset=args.coreset)
+    options.update(overrides)
+    return Pipeline(**options)
+
+
+def cmd_prepare(args):
+    import numpy as np
+
+    from . import prepared
+    pipeline = _pipeline(args, prepared=None)
+    scaled = pipeline.scale()
+    index = pipeline.ingest()[0]
+    try:
+        prepared.save(args.output, scaled['X_scaled'], scaled['mean'], scaled['scale'], pipeline.columns, index)
+    except FileExistsError as exc:
+        raise SystemExit(str(exc))
+    print('wrote {} rows to {}'.format(len(index), args.output))
+    if args.csv:
+        header = ','.join([''] + pipeline.columns)
+        body = np.column_stack([np.arange(len(index)), scaled['X_scaled']])
+        np.savetxt(args.csv, body, delimiter=',', header=header, comments='',
+                   fmt=['%d'] + ['%.17g'] * len(pipeline.columns))
+        print('wrote {} rows to {}'.format(len(index), args.csv))
+
+
+def cmd_sweep(args):
+    pipeline = _pipeline(args, kvalues=range(args.kmin, args.kmax + 1), silhouette=args.silhouette)
+    result = pipeline.sweep()
+    print('{:>3} {:>14} {:>6} {:>9} {:>10}'.format('k', 'inertia', 'iter', 'seconds', 'silhouette'))
+    for row in zip(result.kvalues, result.inertia, result.n_iter, result.seconds, result.silhouette):
+        print('{:>3} {:>14.2f} {:>6} {:>9.3f} {:>10.4f}'.format(*row))
+
+
+def cmd_select(args):
+    pipeline = _pipeline(args, kvalues=range(args.kmin, args.kmax + 1), silhouette=args.silhouette)
+    print(pipeline.select(gap=not args.no_gap).summary())
+
+
+def cmd_fit(args):
+    from .serve import ScoringModel
+    pipeline = _pipeline(args, n_init=args.n_init, init=args.init)
+    if args.k == 'auto':
+        pipeline.kvalues = list(range(args.kmin, args.kmax + 1))
+        pipeline.n_clusters = pipeline.select().k
+    else:
+        pipeline.n_clusters = int(args.k)
+    fitted = pipeline.fit()
+    ScoringModel.from_pipeline(pipeline).save(args.model)
+    print('k={} inertia={:.2f} iterations={} -> {}'.format(pipeline.n_clusters, fitted['inertia'], fitted['n_iter'],
+                                                           args.model))
+
+
+def _score_prepared(args, model):
+    # Rows of a prepared data set are already scaled: map them and label block by block
+    import numpy as np
+
+    from . import distance, prepared
+    data = prepared.load(args.input)
+    if data.columns != model.columns:
+        raise SystemExit('{} was prepared with different columns than {}'.format(args.input, args.model))
+    if not (np.allclose(data.mean, model.mean) and np.allclose(data.scale, model.scale)):
+        # Prepared rows are only comparable with the centroids under the scaler the model was fitted with
+        raise SystemExit('{} was standardized with a different scaler than {}; score the raw CSV instead'.format(
+            args.input, args.model))
+    out = open(args.output, 'w') if args.output != '-' else sys.stdout
+    out.write('CaseOrder,cluster\n')
+    centers = model.centers.astype(data.X_scaled.dtype)
+    for start in range(0, len(data.X_scaled), args.batch_size):
+        labels = distance.nearest(data.X_scaled[start:start + args.batch_size], centers)[0]
+        rows = np.column_stack([data.index[start:start + args.batch_size], labels])
+        np.savetxt(out, rows, fmt='%d', delimiter=',')
+    if out is not sys.stdout:
+        out.close()
+
+
+def cmd_score(args):
+    import csv
+
+    import numpy as np
+
+    from .prepared import is_prepared
+    from .serve import ScoringModel
+    model = ScoringModel.load(args.model)
+    if is_prepared(args.input):
+        return _score_prepared(args, model)
+    out = open(args.output, 'w', newline='') if args.output != '-' else sys.stdout
+    with open(args.input, newline='') as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        positions = [header.index(c) for c in model.columns]
+        writer = csv.writer(out, lineterminator='\n')
+        writer.writerow([header[0], 'cluster'])
+        # Label the file in bounded batches of rows
+        while True:
+            batch = [row for _, row in zip(range(args.batch_size), reader)]
+            if not batch:
+                break
+            values = np.array([[row[p] for p in positions] for row in batch], dtype=np.float64)
+            writer.writerows(zip((row[0] for row in batch), model.assign(values).tolist()))
+    if out is not sys.stdout:
+        out.close()
+
+
+def cmd_serve(args):
+    from . import serve
+    serve.main([args.model, '--host', args.host, '--port', str(args.port)])
+
+
+def cmd_coreset(args):
+    pipeline = _pipeline(args, n_clusters=args.k, n_init=args.n_init, init=args.init,
+                         coreset=args.coreset or args.size)
+    for name, value in pipeline.coreset_error().items():
+        print('{:<16} {}'.format(name, '{:.6g}'.format(value) if isinstance(value, float) else value))
+
+
+def cmd_churn(args):
+    from .churn import CATEGORICAL, format_report
+    pipeline = _pipeline(args, n_clusters=args.k, n_init=args.n_init, init=args.init)
+    print(format_report(pipeline.churn(args.columns or CATEGORICAL)))
+
+
+def _render(job):
+    # Draw one figure in a worker process and save it; runs headless
+    import matplotlib
+    matplotlib.use('Agg')
+    from . import render
+    name, path, kwargs = job
+    if name == 'elbow':
+        from matplotlib.figure import Figure
+        fig = Figure()
+        ax = fig.add_subplot()
+        ax.plot(kwargs['kvalues'], kwargs['inertia'], marker='o')
+        ax.set_xlabel('k')
+        ax.set_ylabel('inertia')
+    else:
+        fig = getattr(render, name)(**kwargs)
+    fig.savefig(path, dpi=100)
+    return path
+
+
+def _flatten(sample):
+    # Rows and labels of a ClusterSample as two flat arrays
+    import numpy as np
+    clusters = sample.clusters()
+    return (np.concatenate([sample.rows[c] for c in clusters]),
+            np.concatenate([np.full(len(sample.rows[c]), c) for c in clusters]))
+
+
+def cmd_report(args):
+    from concurrent.futures import ProcessPoolExecutor
+
+    from . import parallel
+    from .instrument import get_tracer
+    from .render import ClusterSample
+    pipeline = _pipeline(args, n_clusters=args.k, kvalues=range(args.kmin, args.kmax + 1),
+                         n_init=args.n_init, init=args.init)
+    X_scaled = pipeline.scale()['X_scaled']
+    labels = pipeline.labels()
+    projection = pipeline.projection()
+    pca = pipeline.pca()
+    sweep = pipeline.sweep()
+    centers = pipeline.fit()['centers']
+
+    # Reduce to the visual budget here so workers receive only small arrays; projected
+    # chunks go straight into the sample, so the n x 2 plane is never built
+    plane_rows, plane_labels = _flatten(ClusterSample.of(pca.iter_transform(X_scaled, labels), None, args.budget,
+                                                         args.seed))
+    line_rows, line_labels = _flatten(ClusterSample.of(X_scaled, labels, args.lines, args.seed))
+
+    os.makedirs(args.outdir, exist_ok=True)
+    jobs = [
+        ('elbow', 'elbow.png', {'kvalues': sweep.kvalues, 'inertia': sweep.inertia}),
+        ('factorial_plane', 'factorial_plane.png',
+         {'points': plane_rows, 'clusters': plane_labels, 'centers': projection['centers'],
+          'variance_ratio': pca.explained_variance_ratio}),
+        ('parallel_coordinates', 'parallel_coordinates.png',
+         {'X': line_rows, 'clusters': line_labels, 'columns': pipeline.columns, 'budget': args.lines}),
+        ('parallel_coordinates_centroids', 'parallel_coordinates_centroids.png',
+         {'centers': centers, 'columns': pipeline.columns}),
+    ]
+    jobs = [(name, os.path.join(args.outdir, path), kwargs) for name, path, kwargs in jobs]
+    with get_tracer().stage('plotting', figures=len(jobs)):
+        with ProcessPoolExecutor(max_workers=parallel.resolve_jobs(args.jobs, len(jobs))) as pool:
+            for path in pool.map(_render, jobs):
+                print('wrote', path)
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog='churn_clustering', description=__doc__.split('\n\n')[0])
+    parser.add_argument('--trace', metavar='PREFIX',
+                        help='record a stage trace to PREFIX.jsonl and PREFIX.trace.json; per-iteration '
+                             'k-means events need --engine lloyd, elkan or hamerly, as sklearn only reports '
+                             'that it converged')
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    def data_command(name, help):
+        p = sub.add_parser(name, help=help)
+        p.add_argument('--input', default='churn_clean.csv', help='churn export to read')
+        p.add_argument('--cache-dir', default='.cache')
+        p.add_argument('--seed', type=int, default=None)
+        p.add_argument('--jobs', type=int, default=None)
+        p.add_argument('--engine', default='sklearn', choices=['sklearn', 'lloyd', 'elkan', 'hamerly'],
+                       help='k-means backend; sklearn hides its iterations from --trace')
+        p.add_argument('--float32', action='store_true', help='compute in float32')
+        p.add_argument('--prepared', metavar='DIR', help='memory-map a data set written by prepare')
+        p.add_argument('--coreset', type=int, metavar='SIZE',
+                       help='sweep, select and fit on a weighted coreset of about SIZE rows')
+        return p
+
+    p = data_command('prepare', 'standardize and export the prepared data')
+    p.add_argument('--output', default='churn_clean_prepared', help='directory for the .npy export')
+    p.add_argument('--csv', metavar='PATH', help='also write the prepared data as CSV')
+    p.set_defaults(func=cmd_prepare)
+
+    p = data_command('sweep', 'inertia and silhouette for a range of k')
+    p.add_argument('--kmin', type=int, default=1)
+    p.add_argument('--kmax', type=int, default=10)
+    p.add_argument('--silhouette', default='sampled', choices=['simplified', 'sampled', 'exact'])
+    p.set_defaults(func=cmd_sweep)
+
+    p = data_command('select', 'recommend k from the sweep')
+    p.add_argument('--kmin', type=int, default=1)
+    p.add_argument('--kmax', type=int, default=10)
+    p.add_argument('--silhouette', default='sampled', choices=['simplified', 'sampled', 'exact'])
+    p.add_argument('--no-gap', action='store_true', help='skip the gap statistic and its reference fits')
+    p.set_defaults(func=cmd_select)
+
+    p = data_command('fit', 'fit the final model')
+    p.add_argument('-k', default='4', help="number of clusters, or 'auto' to use select's recommendation")
+    p.add_argument('--kmin', type=int, default=1, help="range searched by -k auto")
+    p.add_argument('--kmax', type=int, default=10)
+    p.add_argument('--n-init', type=int, default=1, help='seeded restarts; the best by inertia is kept')
+    p.add_argument('--init', default='k-means++', choices=['k-means++', 'k-means||', 'random'])
+    p.add_argument('--model', default='model.npz')
+    p.set_defaults(func=cmd_fit)
+
+    p = sub.add_parser('score', help='label a CSV or prepared data set with a saved model')
+    p.add_argument('input', help='raw CSV, or a directory written by prepare')
+    p.add_argument('--model', default='model.npz')
+    p.add_argument('--output', default='-', help="output CSV, '-' for stdout")
+    p.add_argument('--batch-size', type=int, default=65536)
+    p.set_defaults(func=cmd_score)
+
+    p = sub.add_parser('serve', help='run the scoring server')
+    p.add_argument('--model', default='model.npz')
+    p.add_argument('--host', default='127.0.0.1')
+    p.add_argument('--port', type=int, default=8000)
+    p.set_defaults(func=cmd_serve)
+
+    p = data_command('coreset', 'coreset fit against a full fit')
+    p.add_argument('-k', type=int, default=4)
+    p.add_argument('--size', type=int, default=10000, help='coreset size when --coreset is not given')
+    p.add_argument('--n-init', type=int, default=1)
+    p.add_argument('--init', default='k-means++', choices=['k-means++', 'k-means||', 'random'])
+    p.set_defaults(func=cmd_coreset)
+
+    p = data_command('churn', 'churn rate and categorical breakdown per cluster')
+    p.add_argument('-k', type=int, default=4)
+    p.add_argument('--n-init', type=int, default=1)
+    p.add_argument('--init', default='k-means++', choices=['k-means++', 'k-means||', 'random'])
+    p.add_argument('--columns', nargs='*', help='categorical columns to break down (default: churn.CATEGORICAL)')
+    p.set_defaults(func=cmd_churn)
+
+    p = data_command('report', 'render the figures to files')
+    p.add_argument('-k', type=int, default=4)
+    p.add_argument('--n-init', type=int, default=1)
+    p.add_argument('--init', default='k-means++', choices=['k-means++', 'k-means||', 'random'])
+    p.add_argument('--kmin', type=int, default=1, help='range for the elbow plot')
+    p.add_argument('--kmax', type=int, default=10)
+    p.add_argument('--outdir', default='figures')
+    p.add_argument('--budget', type=int, default=2000, help='points per cluster in the scatter')
+    p.add_argument('--lines', type=int, default=500, help='rows per cluster in parallel coordinates')
+    p.set_defaults(func=cmd_report)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    tracer = None
+    if args.trace:
+        from . import instrument
+        tracer = instrument.enable()
+    try:
+        return args.func(args)
+    finally:
+        if tracer is not None:
+            tracer.write_jsonl(args.trace + '.jsonl')
+            tracer.write_chrome(args.trace + '.trace.json')
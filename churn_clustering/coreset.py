@@ -0,0 +1,103 @@
+"""Lightweight coresets: cluster a small weighted sample instead of every row.
+
+A lightweight coreset (Bachem, Lucic and Krause, 2018) samples row x with
+probability proportional to
+
+    q(x) = 1/2 * 1/n + 1/2 * d(x, mean)^2 / sum_y d(y, mean)^2
+
+and weights it by the inverse of its inclusion probability.  For any k
+centres the weighted cost of the sample is an unbiased estimate of their
+cost on the full data, with an additive error of at most
+``eps * (cost + full_variance)`` once the size grows like
+``d * k * log k / eps^2``.  Both terms of q only need the mean and the total
+squared deviation, which the quality profile (or the scaler's moments)
+already holds, so the coreset is drawn in a single pass: each row is kept
+independently with probability ``min(1, size * q(x))`` (Poisson sampling),
+chunk by chunk, with no reservoir.
+
+The sweep, restarts and k selection accept ``sample_weight`` and run on
+``points`` and ``weights`` as they are; ``assign`` then labels the full data
+in one blocked nearest-centroid pass, and ``evaluate`` measures how far the
+coreset solution's cost is from a fit on every row.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import distance
+from .restarts import fit as fit_restarts
+from .streaming import BATCH_SIZE, StreamingScaler, iter_batches
+
+SIZE = 10000
+
+
+@dataclass
+class Coreset:
+    points: np.ndarray
+    weights: np.ndarray
+    # Row positions of the points in the source
+    indices: np.ndarray = field(repr=False)
+    n_source: int = 0
+
+
+def build(source, size=SIZE, moments=None, random_state=None, batch_size=BATCH_SIZE, dtype=np.float64):
+    """Draw a lightweight coreset of about ``size`` rows from ``source`` in one pass.
+
+    ``source`` is an array or a chunk source as in the streaming module.
+    ``moments`` is a fitted StreamingScaler for the same rows; without one
+    an extra pass computes it.
+    """
+    if moments is None:
+        moments = StreamingScaler().fit(source, batch_size)
+    n = moments.n_samples_seen_
+    mean = moments.mean_
+    total = float(moments.var_.sum()) * n
+    rng = np.random.default_rng(random_state)
+    points, weights, indices = [], [], []
+    offset = 0
+    for batch in iter_batches(source, batch_size, dtype):
+        d2 = ((batch - mean) ** 2).sum(axis=1)
+        q = 0.5 / n + (0.5 * d2 / total if total > 0 else 0.5 / n)
+        p = np.minimum(1.0, size * q)
+        keep = np.nonzero(rng.random(len(batch)) < p)[0]
+        points.append(batch[keep])
+        weights.append(1.0 / p[keep])
+        indices.append(keep + offset)
+        offset += len(batch)
+    if not points:
+        return Coreset(np.empty((0, len(mean)), dtype=dtype), np.empty(0), np.empty(0, dtype=np.int64), 0)
+    return Coreset(points=np.concatenate(points), weights=np.concatenate(weights),
+                   indices=np.concatenate(indices), n_source=offset)
+
+
+def scaled_moments(n, var, scale):
+    """Moments of standardized data from the raw data's count, variance and scale."""
+    return StreamingScaler().merge_moments(n, np.zeros(len(var)), np.asarray(var) / np.asarray(scale) ** 2 * n)
+
+
+def assign(X, centers):
+    """Labels and total cost of every row of ``X`` against ``centers``, in one blocked pass."""
+    labels, sq_dist = distance.nearest(X, centers)
+    return labels, float(sq_dist.sum())
+
+
+def evaluate(X, coreset, n_clusters, engine='lloyd', n_init=1, init='k-means++', random_state=None):
+    """Fit the coreset and the full data the same way and compare their costs on ``X``.
+
+    Returns a dict with both costs on the full data, the relative excess of
+    the coreset solution, how well the coreset's weighted cost estimated its
+    true cost, and the time each fit took.
+    """
+    options = dict(n_init=n_init, init=init, engine=engine, n_jobs=1, random_state=random_state)
+    start = time.perf_counter()
+    small = fit_restarts(coreset.points, n_clusters, sample_weight=coreset.weights, **options).fit
+    coreset_seconds = time.perf_counter() - start
+    _, coreset_cost = assign(X, small.centers)
+    full = fit_restarts(X, n_clusters, **options)
+    return {'k': n_clusters, 'coreset_size': len(coreset.points), 'rows': len(X),
+            'coreset_cost': coreset_cost, 'full_cost': full.fit.inertia,
+            'relative_error': coreset_cost / full.fit.inertia - 1,
+            'estimate_error': small.inertia / coreset_cost - 1,
+            'coreset_seconds': coreset_seconds, 'full_seconds': full.seconds}
@@ -0,0 +1,25 @@
+"""Blocked squared-Euclidean helpers shared by the clustering stages."""
+
+import numpy as np
+
+BLOCK = 65536
+
+
+def squared_distances(X, centers, x_norms=None):
+    # Dense (rows, k) matrix of squared distances, clipped at zero against rounding
+    if x_norms is None:
+        x_norms = np.einsum('ij,ij->i', X, X)
+    c_norms = np.einsum('ij,ij->i', centers, centers)
+    d = x_norms[:, None] - 2 * (X @ centers.T) + c_norms[None, :]
+    return np.maximum(d, 0, out=d)
+
+
+def nearest(X, centers, block=BLOCK):
+    """Return ``(labels, sq_dist)`` of each row's nearest centre, ``block`` rows at a time."""
+    labels = np.empty(len(X), dtype=np.intp)
+    sq_dist = np.empty(len(X))
+    for start in range(0, len(X), block):
+        d = squared_distances(np.asarray(X[start:start + block]), centers)
+        labels[start:start + block] = d.argmin(axis=1)
+        sq_dist[start:start + block] = d[np.arange(len(d)), labels[start:start + block]]
+    return labels, sq_dist
@@ -0,0 +1,370 @@
+"""Pluggable k-means engines behind the fit and sweep steps.
+
+``lloyd`` recomputes every row-to-centre distance on each iteration.
+``elkan`` keeps an upper bound and k lower bounds per row, ``hamerly`` an
+upper bound and a single lower bound; together with half the distance to the
+nearest other centre they prove most assignments unchanged without computing
+a distance.  All three are NumPy-vectorised, work on row blocks, start from the
+same seeds and converge to the same solution; ``distances`` and ``skipped``
+record how many row-to-centre distances each assignment step computed and
+avoided, against the n*k a Lloyd step needs.
+
+Skipped distances are not saved time.  Lloyd's step is one BLAS product,
+while the bound checks are elementwise NumPy passes over the rows they
+examine, and with only 19 features a bound check costs about as much as the
+distance it avoids.  On 300k rows resampled from the churn table, ``elkan``
+skips 70-90% of distances yet runs at 0.3-0.5x Lloyd's speed for k=4..10,
+and ``hamerly``, which checks one bound per row, breaks even for k=4 and runs
+at about 1.4-2x for k=10.  Prefer ``lloyd`` or ``hamerly``; ``elkan`` is kept
+for the work counts.  ``sklearn`` wraps
+``sklearn.cluster.KMeans`` for comparison; its iterations happen inside
+compiled code, so its FitResult has no per-step ``distances``, ``skipped`` or
+``shifts`` (they are None).
+
+Besides k-means++ and uniform seeding every engine accepts ``init='k-means||'``,
+the oversampled seeding of Bahmani et al.: a few passes that each sample about
+``2k`` candidates at once, then a weighted k-means++ over the candidates, in
+place of the k sequential passes k-means++ needs over the data.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+from sklearn.cluster import KMeans, kmeans_plusplus
+
+from . import distance
+
+BLOCK = 8192
+
+
+@dataclass
+class FitResult:
+    centers: np.ndarray
+    labels: np.ndarray = field(repr=False)
+    inertia: float
+    n_iter: int
+    seconds: float
+    # One entry per assignment step, the initial one included (None when the backend hides its steps)
+    distances: np.ndarray = field(repr=False)
+    skipped: np.ndarray = field(repr=False)
+    # Sum of squared centre movement after each update (None when the backend hides it)
+    shifts: np.ndarray = field(default=None, repr=False)
+
+
+def kmeans_parallel(X, n_clusters, oversampling=2.0, n_rounds=5, random_state=None, sample_weight=None,
+                    block=BLOCK):
+    """k-means|| seeding: oversampled D^2 rounds, then k-means++ on the weighted candidates."""
+    rng = np.random.default_rng(random_state)
+    n = len(X)
+    weights = np.ones(n) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    first = rng.choice(n, p=weights / weights.sum())
+    candidates = [np.asarray(X[[first]])]
+    # Track each row's nearest candidate and its squared distance as candidates are added
+    owner, d2 = distance.nearest(X, candidates[0], block)
+    n_candidates = 1
+    for _ in range(n_rounds):
+        cost = np.dot(weights, d2)
+        if cost <= 0:
+            break
+        # Each row joins independently, so one pass draws about oversampling * k candidates
+        p = np.minimum(1.0, oversampling * n_clusters * weights * d2 / cost)
+        picked = np.nonzero(rng.random(n) < p)[0]
+        if not len(picked):
+            continue
+        candidates.append(np.asarray(X[picked]))
+        near, near_d2 = distance.nearest(X, candidates[-1], block)
+        closer = near_d2 < d2
+        owner[closer] = near[closer] + n_candidates
+        d2[closer] = near_d2[closer]
+        n_candidates += len(picked)
+    C = np.vstack(candidates)
+    candidate_weights = np.bincount(owner, weights=weights, minlength=len(C))
+    if len(C) < n_clusters:
+        # Too few candidates (e.g. many duplicate rows): top up with uniform draws
+        extra = np.sort(rng.choice(n, n_clusters - len(C), replace=False))
+        C = np.vstack([C, np.asarray(X[extra])])
+        candidate_weights = np.concatenate([candidate_weights, weights[extra]])
+    # Reduce the weighted candidates to k centres
+    seeds = kmeans_plusplus(C, n_clusters, sample_weight=candidate_weights,
+                            random_state=int(rng.integers(2 ** 31 - 1)))[0]
+    return Lloyd().fit(C, n_clusters, init=seeds, sample_weight=candidate_weights).centers.astype(X.dtype)
+
+
+def init_centers(X, n_clusters, init='k-means++', random_state=None, sample_weight=None):
+    # Seed centres with k-means++, k-means||, uniformly at random, or from an explicit array
+    if isinstance(init, str):
+        if init == 'k-means||':
+            return kmeans_parallel(X, n_clusters, random_state=random_state, sample_weight=sample_weight)
+        if init == 'k-means++':
+            return kmeans_plusplus(X, n_clusters, random_state=random_state, sample_weight=sample_weight)[0]
+        if init == 'random':
+            rng = np.random.default_rng(random_state)
+            return np.array(X[np.sort(rng.choice(len(X), n_clusters, replace=False))])
+        raise ValueError('unknown init: {!r}'.format(init))
+    return np.array(init, dtype=X.dtype)
+
+
+def _cluster_sums(X, labels, weights, k, block=BLOCK):
+    # Weighted per-cluster row sums and counts, via a one-hot product per row block;
+    # block products stay in the data's dtype, the running sums are float64
+    sums = np.zeros((k, X.shape[1]))
+    for start in range(0, len(X), block):
+        lb = labels[start:start + block]
+        onehot = np.zeros((len(lb), k), dtype=X.dtype)
+        onehot[np.arange(len(lb)), lb] = 1 if weights is None else weights[start:start + block]
+        sums += onehot.T @ np.asarray(X[start:start + block])
+    counts = np.bincount(labels, weights=weights, minlength=k)
+    return sums, counts
+
+
+def _centers_from_sums(sums, counts, old):
+    # Per-cluster means; empty clusters keep their previous centre
+    new = old.copy()
+    filled = counts > 0
+    new[filled] = (sums[filled] / counts[filled, None]).astype(old.dtype, copy=False)
+    return new
+
+
+def _center_geometry(C):
+    # Pairwise centre distances and half the distance to each centre's nearest neighbour
+    cc = np.sqrt(distance.squared_distances(C, C))
+    np.fill_diagonal(cc, np.inf)
+    return cc, 0.5 * cc.min(axis=1)
+
+
+def _row_distances(xs, cs):
+    return np.sqrt(np.einsum('ij,ij->i', xs - cs, xs - cs))
+
+
+class Engine:
+    name = None
+
+    def __init__(self, max_iter=300, tol=1e-4, block=BLOCK):
+        self.max_iter = max_iter
+        self.tol = tol
+        self.block = block
+
+    def fit(self, X, n_clusters, init='k-means++', random_state=None, sample_weight=None):
+        """Cluster ``X`` into ``n_clusters`` and return a FitResult."""
+        start = time.perf_counter()
+        X = np.asarray(X)
+        if X.dtype.kind != 'f':
+            X = X.astype(np.float64)
+        weights = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+        centers = init_centers(X, n_clusters, init, random_state, weights)
+        # Same convention as scikit-learn: tol is relative to the mean feature variance
+        tol = self.tol * float(np.mean(np.var(X, axis=0))) if len(X) else 0.0
+
+        stats = []
+        shifts = []
+        state = self._start(X, centers, stats)
+        labels = state['a'].copy()
+        sums, counts = _cluster_sums(X, labels, weights, n_clusters, self.block)
+        n_iter = 0
+        for n_iter in range(1, self.max_iter + 1):
+            new = _centers_from_sums(sums, counts, centers)
+            shift = np.sqrt(((new - centers) ** 2).sum(axis=1))
+            shifts.append(float((shift ** 2).sum()))
+            centers = new
+            self._assign(X, centers, shift, state, stats)
+            moved = np.nonzero(state['a'] != labels)[0]
+            # Only rows that changed cluster touch the running sums
+            if len(moved):
+                xm = np.asarray(X[moved])
+                wm = None if weights is None else weights[moved]
+                out_sums, out_counts = _cluster_sums(xm, labels[moved], wm, n_clusters, self.block)
+                in_sums, in_counts = _cluster_sums(xm, state['a'][moved], wm, n_clusters, self.block)
+                sums += in_sums - out_sums
+                counts += in_counts - out_counts
+                labels[moved] = state['a'][moved]
+            if not len(moved) or shifts[-1] <= tol:
+                break
+
+        sq = ((X - centers[labels]) ** 2).sum(axis=1)
+        inertia = float(sq.sum(dtype=np.float64) if weights is None else np.dot(sq.astype(np.float64), weights))
+        distances = np.array(stats, dtype=np.int64)
+        return FitResult(centers=centers, labels=labels, inertia=inertia, n_iter=n_iter,
+                         seconds=time.perf_counter() - start, distances=distances,
+                         skipped=len(X) * n_clusters - distances, shifts=np.array(shifts))
+
+    def _full(self, X, centers, stats):
+        # Every row-to-centre distance, computed blockwise
+        d = np.empty((len(X), len(centers)), dtype=X.dtype)
+        for start in range(0, len(X), self.block):
+            d[start:start + self.block] = np.sqrt(
+                distance.squared_distances(np.asarray(X[start:start + self.block]), centers))
+        stats.append(d.size)
+        return d
+
+
+class Lloyd(Engine):
+    name = 'lloyd'
+
+    def _start(self, X, centers, stats):
+        state = {}
+        self._assign(X, centers, None, state, stats)
+        return state
+
+    def _assign(self, X, centers, shift, state, stats):
+        state['a'] = distance.nearest(X, centers, self.block)[0]
+        stats.append(len(X) * len(centers))
+
+
+class Elkan(Engine):
+    name = 'elkan'
+
+    # Lower bounds are stored lazily as l + D, with D each centre's total movement so far: the bound
+    # at any later point is the stored value minus the current D, so moving the centres costs O(k)
+    # instead of touching all n*k bounds, and only rows that get examined ever read theirs
+
+    def _start(self, X, centers, stats):
+        lower = self._full(X, centers, stats)
+        a = lower.argmin(axis=1)
+        return {'a': a, 'u': lower[np.arange(len(X)), a], 'l': lower, 'D': np.zeros(len(centers))}
+
+    def _assign(self, X, centers, shift, state, stats):
+        a, u, lower, D = state['a'], state['u'], state['l'], state['D']
+        # Move the upper bounds by how far each own centre travelled; the lower bounds follow D
+        u += shift[a]
+        D += shift
+        cc, s = _center_geometry(centers)
+        computed = 0
+        for start in range(0, len(X), self.block):
+            stop = min(start + self.block, len(X))
+            ub, ab, lb = u[start:stop], a[start:stop], lower[start:stop]
+            active = np.nonzero(ub > s[ab])[0]
+            if not len(active):
+                continue
+            aa = ab[active]
+            bound = lb[active] - D
+            cand = (ub[active, None] > bound) & (ub[active, None] > 0.5 * cc[aa])
+            keep = cand.any(axis=1)
+            rows, bound = active[keep], bound[keep]
+            if not len(rows):
+                continue
+            # Tighten the upper bound with the one exact distance to the own centre
+            ar = ab[rows]
+            xr = np.asarray(X[start + rows])
+            d_own = _row_distances(xr, centers[ar])
+            computed += len(rows)
+            lb[rows, ar] = d_own + D[ar]
+            ub[rows] = d_own
+            bound[np.arange(len(rows)), ar] = d_own
+            cand = (d_own[:, None] > bound) & (d_own[:, None] > 0.5 * cc[ar])
+            cand[np.arange(len(rows)), ar] = False
+            # Candidates as a sparse (row, centre) list, ordered by row then centre
+            ri, cj = np.nonzero(cand)
+            if not len(ri):
+                continue
+            d = _row_distances(xr[ri], centers[cj])
+            computed += len(ri)
+            lb[rows[ri], cj] = d + D[cj]
+            # Nearest candidate of each row; ties go to the lower centre index, as argmin does
+            starts = np.flatnonzero(np.r_[True, ri[1:] != ri[:-1]])
+            group = ri[starts]
+            nearest = np.minimum.reduceat(d, starts)
+            first = np.flatnonzero(d == np.repeat(nearest, np.diff(np.r_[starts, len(ri)])))
+            first = first[np.r_[True, ri[first[1:]] != ri[first[:-1]]]]
+            best = cj[first]
+            own = ar[group]
+            switch = (nearest < d_own[group]) | ((nearest == d_own[group]) & (best < own))
+            ab[rows[group[switch]]] = best[switch]
+            ub[rows[group[switch]]] = nearest[switch]
+        stats.append(computed)
+
+
+class Hamerly(Engine):
+    name = 'hamerly'
+
+    def _start(self, X, centers, stats):
+        d = self._full(X, centers, stats)
+        return dict(zip(('a', 'u', 'l'), self._two_nearest(d)))
+
+    @staticmethod
+    def _two_nearest(d):
+        # Index and distance of the nearest centre, and distance to the second nearest
+        rows = np.arange(len(d))
+        a = d.argmin(axis=1)
+        u = d[rows, a]
+        if d.shape[1] < 2:
+            return a, u, np.full(len(d), np.inf)
+        d[rows, a] = np.inf
+        return a, u, d.min(axis=1)
+
+    def _assign(self, X, centers, shift, state, stats):
+        a, u, lower = state['a'], state['u'], state['l']
+        u += shift[a]
+        # Each lower bound drops by the largest move among the other centres
+        order = np.argsort(shift)
+        largest = order[-1]
+        second = shift[order[-2]] if len(shift) > 1 else 0.0
+        lower -= np.where(a == largest, second, shift[largest])
+        cc, s = _center_geometry(centers)
+        computed = 0
+        for start in range(0, len(X), self.block):
+            stop = min(start + self.block, len(X))
+            ub, ab, lb = u[start:stop], a[start:stop], lower[start:stop]
+            bound = np.maximum(s[ab], lb)
+            active = np.nonzero(ub > bound)[0]
+            if not len(active):
+                continue
+            d = np.sqrt(distance.squared_distances(np.asarray(X[start + active]), centers))
+            computed += d.size
+            ab[active], ub[active], lb[active] = self._two_nearest(d)
+        stats.append(computed)
+
+
+class Sklearn(Engine):
+    name = 'sklearn'
+
+    def fit(self, X, n_clusters, init='k-means++', random_state=None, sample_weight=None):
+        start = time.perf_counter()
+        X = np.asarray(X)
+        if isinstance(init, str) and init == 'k-means||':
+            init = init_centers(X, n_clusters, init, random_state, sample_weight)
+        if not isinstance(init, str):
+            init = np.array(init, dtype=X.dtype if X.dtype.kind == 'f' else np.float64)
+        kmeans = KMeans(n_clusters=n_clusters, init=init, n_init=1, max_iter=self.max_iter, tol=self.tol,
+                        random_state=random_state, algorithm='lloyd')
+        kmeans.fit(X, sample_weight=sample_weight)
+        # scikit-learn reports only the final state, not what each step did
+        return FitResult(centers=kmeans.cluster_centers_, labels=kmeans.labels_, inertia=float(kmeans.inertia_),
+                         n_iter=kmeans.n_iter_, seconds=time.perf_counter() - start, distances=None, skipped=None,
+                         shifts=None)
+
+
+ENGINES = {engine.name: engine for engine in (Lloyd, Elkan, Hamerly, Sklearn)}
+
+
+def get_engine(name, **kwargs):
+    """Instantiate an engine by name: 'lloyd', 'elkan', 'hamerly' or 'sklearn'."""
+    try:
+        return ENGINES[name](**kwargs)
+    except KeyError:
+        raise ValueError('unknown engine: {!r}'.format(name)) from None
+
+
+def compare_engines(X, n_clusters, engines=('lloyd', 'elkan', 'hamerly'), random_state=0, **kwargs):
+    """Fit every engine from the same seeds and report time, work and agreement.
+
+    Returns one dict per engine with wall time, iterations, inertia, the
+    fraction of distance computations skipped (NaN for sklearn) and the
+    speed-up over the first engine listed.
+    """
+    X = np.asarray(X)
+    init = init_centers(X, n_clusters, 'k-means++', random_state)
+    rows = []
+    for name in engines:
+        result = get_engine(name, **kwargs).fit(X, n_clusters, init=init)
+        skipped = np.nan
+        if result.distances is not None:
+            skipped = float(result.skipped.sum() / (result.distances.sum() + result.skipped.sum()))
+        rows.append({'engine': name, 'seconds': result.seconds, 'n_iter': result.n_iter,
+                     'inertia': result.inertia, 'skipped_fraction': skipped,
+                     'labels': result.labels})
+    base_labels = rows[0]['labels']
+    for row in rows:
+        row['speedup'] = rows[0]['seconds'] / row['seconds']
+        row['same_labels'] = bool(np.array_equal(row.pop('labels'), base_labels))
+    return rows
@@ -0,0 +1,206 @@
+"""Incremental centroid updates for monthly deltas of churn records.
+
+Instead of re-reading the full export, refitting the scaler and rerunning
+k-means from scratch, an IncrementalModel keeps running (optionally decayed)
+sums of the raw features, overall and per cluster.  The scaler moments and the
+scaled-space centroids are derived from those sums, so folding in new
+customers or removing departed ones is O(rows in the delta).  A full refit is
+only triggered when a drift metric crosses ``drift_threshold``.
+
+Sums are accumulated relative to a fixed shift (the training mean) to keep
+the variance computation numerically stable for large-valued columns such as
+Income.
+
+Each update is a numbered period (the training data is period 0).  With
+``decay`` below 1 a row added in period p carries weight
+``decay ** (current period - p)``, so removing it subtracts exactly that
+weight; callers pass the period and the label each departed row was given,
+both reported by the update that added it.  A cluster whose rows have all
+been removed keeps its last centroid, as in the engines, until rows are
+assigned to it again.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import COLUMNS, distance
+from .engines import _centers_from_sums, get_engine
+
+# Clusters holding less than this much weight count as empty, absorbing float residue from removals
+EMPTY_WEIGHT = 1e-9
+
+
+@dataclass
+class UpdateReport:
+    added: int
+    removed: int
+    cost_drift: float
+    mean_shift: float
+    needs_refit: bool
+    refitted: bool = False
+    # Period the added rows belong to and the labels they were given, to store for their removal
+    period: int = 0
+    labels: np.ndarray = field(default=None, repr=False)
+
+
+class IncrementalModel:
+
+    def __init__(self, shift, weight, sum_, sumsq, counts, sums, baseline_cost, columns=COLUMNS,
+                 decay=1.0, drift_threshold=0.1, period=0, last_centers=None):
+        self.columns = list(columns)
+        self.shift = np.asarray(shift, dtype=np.float64)
+        self.weight = float(weight)
+        self.sum = np.asarray(sum_, dtype=np.float64)
+        self.sumsq = np.asarray(sumsq, dtype=np.float64)
+        self.counts = np.asarray(counts, dtype=np.float64)
+        self.sums = np.asarray(sums, dtype=np.float64)
+        self.baseline_cost = float(baseline_cost)
+        self.decay = decay
+        self.drift_threshold = drift_threshold
+        self.period = int(period)
+        # Shifted-space centroids of the last update, kept for clusters that become empty
+        self._last_centers = np.zeros_like(self.sums) if last_centers is None else np.asarray(last_centers,
+                                                                                                dtype=np.float64)
+        self._last_centers = _centers_from_sums(self.sums, self.counts, self._last_centers)
+        self._fit_mean, self._fit_scale = self.mean, self.scale
+
+    @classmethod
+    def from_fit(cls, X, labels, n_clusters, **kwargs):
+        """Build the running statistics from raw training rows and their labels."""
+        X = np.asarray(X, dtype=np.float64)
+        labels = np.asarray(labels)
+        shift = X.mean(axis=0)
+        Xs = X - shift
+        counts = np.bincount(labels, minlength=n_clusters).astype(np.float64)
+        sums = np.stack([np.bincount(labels, weights=Xs[:, j], minlength=n_clusters)
+                         for j in range(X.shape[1])], axis=1)
+        model = cls(shift, len(X), Xs.sum(axis=0), (Xs ** 2).sum(axis=0), counts, sums, 0.0, **kwargs)
+        model.baseline_cost = model._cost(X, labels)
+        return model
+
+    @classmethod
+    def fit(cls, X, n_clusters, engine='sklearn', random_state=None, **kwargs):
+        """Fit from scratch on raw rows: standardize, cluster, then track."""
+        X = np.asarray(X, dtype=np.float64)
+        mean, scale = X.mean(axis=0), X.std(axis=0)
+        scale[scale == 0] = 1.0
+        fitted = get_engine(engine).fit((X - mean) / scale, n_clusters, random_state=random_state)
+        return cls.from_fit(X, fitted.labels, n_clusters, **kwargs)
+
+    @property
+    def mean(self):
+        return self.shift + self.sum / self.weight
+
+    @property
+    def scale(self):
+        var = np.maximum(self.sumsq / self.weight - (self.sum / self.weight) ** 2, 0)
+        scale = np.sqrt(var)
+        scale[scale == 0] = 1.0
+        return scale
+
+    @property
+    def centers(self):
+        # Scaled-space centroids under the current scaler moments
+        return (self._last_centers + self.shift - self.mean) / self.scale
+
+    def transform(self, X):
+        return (np.asarray(X, dtype=np.float64) - self.mean) / self.scale
+
+    def predict(self, X):
+        return distance.nearest(self.transform(X), self.centers)[0]
+
+    def _cost(self, X, labels):
+        # Mean squared distance of scaled rows to their assigned centroid
+        if not len(X):
+            return 0.0
+        Xs = self.transform(X)
+        return float(((Xs - self.centers[labels]) ** 2).sum(axis=1).mean())
+
+    def _accumulate(self, X, labels, weights):
+        # Add rows with per-row (or one shared) weight; negative weights remove them
+        Xs = np.asarray(X, dtype=np.float64) - self.shift
+        weights = np.broadcast_to(np.asarray(weights, dtype=np.float64), (len(Xs),))
+        k = len(self.counts)
+        self.weight += weights.sum()
+        self.sum += weights @ Xs
+        self.sumsq += weights @ Xs ** 2
+        self.counts += np.bincount(labels, weights=weights, minlength=k)
+        for j in range(Xs.shape[1]):
+            self.sums[:, j] += np.bincount(labels, weights=weights * Xs[:, j], minlength=k)
+        empty = self.counts < EMPTY_WEIGHT
+        self.counts[empty] = 0
+        self.sums[empty] = 0
+        self._last_centers = _centers_from_sums(self.sums, self.counts, self._last_centers)
+
+    def update(self, X_new, X_left=None, labels_left=None, periods_left=0, refit=None):
+        """Fold a monthly delta into the model as the next period.
+
+        ``X_new`` are raw rows of new customers; ``X_left`` raw rows of
+        customers who left.  ``labels_left`` should be the labels the rows
+        were stored with (the training labels, or ``UpdateReport.labels``);
+        without them the rows are reassigned to the current centroids, which
+        removes them from the wrong clusters once centroids have moved.
+        ``periods_left`` is the period each row was added in (0 for training
+        rows, else ``UpdateReport.period``) and sets its decayed weight.  All
+        history is first multiplied by ``decay``.  ``cost_drift`` is NaN when
+        there are no new rows to measure.  When the drift metric crosses the
+        threshold and ``refit`` is given, it is called for the full raw data
+        set and the model is rebuilt from scratch.
+        """
+        X_new = np.asarray(X_new, dtype=np.float64)
+        if self.decay != 1.0:
+            for name in ('weight', 'sum', 'sumsq', 'counts', 'sums'):
+                setattr(self, name, getattr(self, name) * self.decay)
+        self.period += 1
+        removed = 0
+        if X_left is not None and len(X_left):
+            labels_left = self.predict(X_left) if labels_left is None else np.asarray(labels_left)
+            periods_left = np.asarray(periods_left)
+            if np.any(periods_left < 0) or np.any(periods_left >= self.period):
+                raise ValueError('periods_left must name earlier periods, 0 to {}'.format(self.period - 1))
+            self._accumulate(X_left, labels_left, -self.decay ** (self.period - periods_left))
+            removed = len(X_left)
+        labels = self.predict(X_new)
+        self._accumulate(X_new, labels, 1.0)
+
+        # Drift: how much worse the delta fits than the training data did, and how far the scaler moved
+        if not len(X_new):
+            cost_drift = float('nan')
+        elif self.baseline_cost:
+            cost_drift = self._cost(X_new, self.predict(X_new)) / self.baseline_cost - 1
+        else:
+            cost_drift = 0.0
+        mean_shift = float(np.max(np.abs(self.mean - self._fit_mean) / self._fit_scale))
+        needs_refit = cost_drift > self.drift_threshold or mean_shift > self.drift_threshold
+        report = UpdateReport(added=len(X_new), removed=removed, cost_drift=float(cost_drift),
+                              mean_shift=mean_shift, needs_refit=needs_refit, period=self.period, labels=labels)
+        if needs_refit and refit is not None:
+            fresh = type(self).fit(refit(), len(self.counts), columns=self.columns, decay=self.decay,
+                                   drift_threshold=self.drift_threshold)
+            self.__dict__.update(fresh.__dict__)
+            # Every row is now training data with labels from the new fit, which the caller has to predict
+            report.refitted, report.period, report.labels = True, 0, None
+        return report
+
+    def scoring_model(self):
+        # Snapshot for the scoring server
+        from .serve import ScoringModel
+        return ScoringModel(columns=self.columns, mean=self.mean, scale=self.scale, centers=self.centers)
+
+    def save(self, path):
+        np.savez(path, columns=np.array(self.columns), shift=self.shift, weight=self.weight, sum=self.sum,
+                 sumsq=self.sumsq, counts=self.counts, sums=self.sums, baseline_cost=self.baseline_cost,
+                 decay=self.decay, drift_threshold=self.drift_threshold, period=self.period,
+                 last_centers=self._last_centers, fit_mean=self._fit_mean,
+                 fit_scale=self._fit_scale)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            model = cls(data['shift'], data['weight'], data['sum'], data['sumsq'], data['counts'], data['sums'],
+                        data['baseline_cost'], columns=[str(c) for c in data['columns']],
+                        decay=float(data['decay']), drift_threshold=float(data['drift_threshold']),
+                        period=int(data['period']), last_centers=data['last_centers'])
+            model._fit_mean, model._fit_scale = data['fit_mean'], data['fit_scale']
+        return model
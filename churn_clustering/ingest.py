@@ -0,0 +1,193 @@
+"""Column-projected, chunked ingestion of churn_clean.csv with a binary cache.
+
+code.py parses all 50 columns of the export, text fields included, only to
+keep the 19 clustering variables, and then parses the whole file again for the
+churn summary.  Here only the requested columns are parsed, with explicit
+dtypes and in bounded-size chunks.  The first read also writes one raw binary
+file per column into a cache directory, so later runs memory-map those files
+and never touch the CSV again.
+
+Text columns such as Churn or Contract are cached the same way by
+``load_codes``, as int32 category codes with their levels in the metadata.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from . import COLUMNS
+
+INDEX = 'CaseOrder'
+CHUNKSIZE = 100_000
+
+
+def iter_chunks(path, columns=COLUMNS, chunksize=CHUNKSIZE, dtype=np.float64):
+    # Parse only the index and the requested columns, ``chunksize`` rows at a time
+    reader = pd.read_csv(path, usecols=[INDEX] + list(columns), index_col=INDEX,
+                         dtype={c: dtype for c in columns}, chunksize=chunksize, engine='c')
+    with reader:
+        for chunk in reader:
+            yield chunk[list(columns)]
+
+
+def cache_key(path, columns, dtype):
+    # Identify a cache entry by the source file's identity and the projection requested;
+    # dtype 'category' marks an entry of text columns stored as codes, where only empty cells are missing
+    kind = 'category:empty-na' if isinstance(dtype, str) and dtype == 'category' else np.dtype(dtype).str
+    stat = os.stat(path)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(json.dumps([os.path.abspath(path), stat.st_size, stat.st_mtime_ns,
+                         list(columns), kind]).encode())
+    return h.hexdigest()
+
+
+def _column_file(directory, i):
+    return os.path.join(directory, 'col{:03d}.bin'.format(i))
+
+
+def _publish(path, directory, columns, chunks, encode, dtype, meta=None):
+    # Write each chunk's index and its columns, as ``encode(column, values)`` arrays, into one raw
+    # binary file per column under a temporary directory, then publish it as ``directory`` atomically.
+    # ``meta`` returns extra meta.json fields once every chunk has been written
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.ingest-')
+    try:
+        files = [open(_column_file(tmp, i), 'wb') for i in range(len(columns))]
+        index = open(os.path.join(tmp, 'index.bin'), 'wb')
+        n_rows = 0
+        try:
+            for chunk in chunks:
+                index.write(chunk.index.to_numpy(dtype=np.int64).tobytes())
+                for f, column in zip(files, columns):
+                    f.write(encode(column, chunk[column]).tobytes())
+                n_rows += len(chunk)
+        finally:
+            for f in files + [index]:
+                f.close()
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump(dict({'source': os.path.abspath(path), 'rows': n_rows, 'columns': list(columns),
+                            'dtype': np.dtype(dtype).str}, **(meta() if meta else {})), f)
+        try:
+            os.replace(tmp, directory)
+        except OSError:
+            # Another process published the same entry first
+            shutil.rmtree(tmp, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+
+
+def _write_cache(path, directory, columns, chunksize, dtype):
+    # Stream the CSV into one raw binary file per column
+    _publish(path, directory, columns, iter_chunks(path, columns, chunksize, dtype),
+             lambda column, values: values.to_numpy(dtype=dtype), dtype)
+
+
+def _open_cache(directory):
+    # Memory-map every column of a published cache entry
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    n, dtype = meta['rows'], np.dtype(meta['dtype'])
+    index = np.memmap(os.path.join(directory, 'index.bin'), dtype=np.int64, mode='r', shape=(n,)) \
+        if n else np.empty(0, dtype=np.int64)
+    data = {column: (np.memmap(_column_file(directory, i), dtype=dtype, mode='r', shape=(n,))
+                     if n else np.empty(0, dtype=dtype))
+            for i, column in enumerate(meta['columns'])}
+    return index, data
+
+
+def open_columns(path, columns=COLUMNS, cache_dir='.cache/ingest', chunksize=CHUNKSIZE, dtype=np.float64):
+    """Return ``(index, {column: memmap})`` for ``path``, building the cache on first use."""
+    directory = os.path.join(cache_dir, cache_key(path, columns, dtype))
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        _write_cache(path, directory, columns, chunksize, dtype)
+    return _open_cache(directory)
+
+
+def _iter_text_chunks(path, columns, chunksize):
+    # Text columns as str, where only empty cells are missing: "None" and "NA" are real levels
+    # (InternetService has "None")
+    reader = pd.read_csv(path, usecols=[INDEX] + list(columns), index_col=INDEX,
+                         dtype={c: str for c in columns}, keep_default_na=False, na_values=[''],
+                         chunksize=chunksize, engine='c')
+    with reader:
+        for chunk in reader:
+            yield chunk[list(columns)]
+
+
+def _write_codes_cache(path, directory, columns, chunksize):
+    # Stream text columns into int32 codes per column; levels are numbered by first appearance
+    levels = {column: {} for column in columns}
+
+    def encode(column, values):
+        seen = levels[column]
+        for value in values.dropna().unique():
+            seen.setdefault(value, len(seen))
+        return pd.Categorical(values, categories=list(seen)).codes.astype(np.int32)
+    _publish(path, directory, columns, _iter_text_chunks(path, columns, chunksize), encode, np.int32,
+             lambda: {'levels': {c: list(levels[c]) for c in columns}})
+
+
+def load_codes(path, columns, cache_dir='.cache/ingest', chunksize=CHUNKSIZE):
+    """Return ``(index, {column: (codes, levels)})`` for text columns of ``path``.
+
+    ``codes`` is an int32 memmap with -1 for empty cells and ``levels`` the
+    list of category names the codes point into.
+    """
+    directory = os.path.join(cache_dir, cache_key(path, columns, 'category'))
+    if not os.path.exists(os.path.join(directory, 'meta.json')):
+        _write_codes_cache(path, directory, columns, chunksize)
+    index, data = _open_cache(directory)
+    with open(os.path.join(directory, 'meta.json')) as f:
+        levels = json.load(f)['levels']
+    return index, {column: (codes, levels[column]) for column, codes in data.items()}
+
+
+def load(path, columns=COLUMNS, cache_dir='.cache/ingest', chunksize=CHUNKSIZE, dtype=np.float64):
+    """Load the requested columns as a DataFrame indexed by CaseOrder.
+
+    Pass ``cache_dir=None`` to parse the CSV without writing a cache.
+    """
+    if cache_dir is None:
+        chunks = list(iter_chunks(path, columns, chunksize, dtype))
+        if chunks:
+            return pd.concat(chunks)
+        return pd.DataFrame({c: np.empty(0, dtype=dtype) for c in columns},
+                            index=pd.Index([], dtype=np.int64, name=INDEX))
+    index, data = open_columns(path, columns, cache_dir, chunksize, dtype)
+    return pd.DataFrame(data, index=pd.Index(index, name=INDEX), columns=list(columns))
+
+
+def load_matrix(path, columns=COLUMNS, cache_dir='.cache/ingest', chunksize=CHUNKSIZE, dtype=np.float64,
+                profile=None):
+    """Return ``(index, X)`` with X a C-ordered ``(rows, len(columns))`` array.
+
+    A quality.Profile passed as ``profile`` is updated with every chunk as it
+    is read, so the data-quality checks need no pass of their own.
+    """
+    if cache_dir is None:
+        indexes, blocks = [], []
+        for chunk in iter_chunks(path, columns, chunksize, dtype):
+            indexes.append(chunk.index.to_numpy(dtype=np.int64))
+            blocks.append(chunk.to_numpy(dtype=dtype))
+            if profile is not None:
+                profile.update(blocks[-1])
+        if not blocks:
+            return np.empty(0, dtype=np.int64), np.empty((0, len(columns)), dtype=dtype)
+        return np.concatenate(indexes), np.concatenate(blocks)
+    index, data = open_columns(path, columns, cache_dir, chunksize, dtype)
+    X = np.empty((len(index), len(columns)), dtype=dtype)
+    # Fill the row-major matrix in bounded slices so no second full copy is held
+    for start in range(0, len(index), chunksize):
+        stop = start + chunksize
+        for j, column in enumerate(columns):
+            X[start:stop, j] = data[column][start:stop]
+        if profile is not None:
+            profile.update(X[start:stop])
+    return np.asarray(index), X
@@ -0,0 +1,166 @@
+"""Per-stage instrumentation with JSON-lines and Chrome-trace export.
+
+Wrap a stage in ``get_tracer().stage(name, **attrs)`` to record its wall
+time, CPU time, RSS before and after, the process's peak RSS and any
+attributes (array shapes and byte sizes are filled in for ndarray values).
+``record_fit`` turns an engine FitResult into per-iteration convergence
+events, or a single ``converged`` event for engines that hide their
+iterations (``sklearn``, the CLI's default); ``steps_reported`` on that event
+says which.  The default tracer is disabled: ``stage`` then hands back one shared
+no-op context manager and ``event`` returns at once, so instrumented code
+costs a function call per stage when tracing is off.
+
+    tracer = instrument.enable()
+    ...run the pipeline...
+    tracer.write_jsonl('trace.jsonl')
+    tracer.write_chrome('trace.json')   # open in chrome://tracing or Perfetto
+"""
+
+import json
+import os
+import resource
+import sys
+import threading
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+try:
+    _PAGE = os.sysconf('SC_PAGE_SIZE')
+except (AttributeError, ValueError, OSError):
+    _PAGE = 4096
+
+
+def _rss():
+    # Current resident set size in bytes, or None where /proc is unavailable
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * _PAGE
+    except OSError:
+        return None
+
+
+def _peak_rss():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+def _describe(value):
+    # Arrays are summarised by shape, dtype and size rather than serialised
+    if isinstance(value, np.ndarray):
+        return {'shape': list(value.shape), 'dtype': value.dtype.str, 'bytes': int(value.nbytes)}
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+class _NullSpan:
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def __setitem__(self, key, value):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Tracer:
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.records = []
+        self._origin = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _now_us(self):
+        return (time.perf_counter() - self._origin) * 1e6
+
+    def stage(self, name, **attrs):
+        """Context manager timing one stage; the yielded span accepts more attributes."""
+        if not self.enabled:
+            return _NULL_SPAN
+        return self._span(name, attrs)
+
+    @contextmanager
+    def _span(self, name, attrs):
+        span = dict(attrs)
+        start, cpu, rss = self._now_us(), time.process_time(), _rss()
+        try:
+            yield span
+        finally:
+            record = {'type': 'stage', 'name': name, 'ts_us': start, 'dur_us': self._now_us() - start,
+                      'cpu_s': time.process_time() - cpu, 'rss_before': rss, 'rss_after': _rss(),
+                      'peak_rss': _peak_rss(), 'pid': os.getpid(), 'tid': threading.get_ident(),
+                      'attrs': {k: _describe(v) for k, v in span.items()}}
+            with self._lock:
+                self.records.append(record)
+
+    def event(self, name, **attrs):
+        if not self.enabled:
+            return
+        with self._lock:
+            self.records.append({'type': 'event', 'name': name, 'ts_us': self._now_us(), 'pid': os.getpid(),
+                                 'tid': threading.get_ident(), 'attrs': {k: _describe(v) for k, v in attrs.items()}})
+
+    def record_fit(self, name, result):
+        # One convergence event per assignment step of an engine FitResult, when the engine reports them
+        if not self.enabled:
+            return
+        shifts = getattr(result, 'shifts', None)
+        steps = [] if result.distances is None else zip(result.distances, result.skipped)
+        for i, (computed, skipped) in enumerate(steps):
+            attrs = {'iteration': i, 'distances': int(computed), 'skipped': int(skipped)}
+            if shifts is not None and 0 < i <= len(shifts):
+                attrs['center_shift'] = float(shifts[i - 1])
+            self.event(name + '.iteration', **attrs)
+        self.event(name + '.converged', n_iter=result.n_iter, inertia=result.inertia, seconds=result.seconds,
+                   steps_reported=result.distances is not None)
+
+    def write_jsonl(self, path):
+        with open(path, 'w') as f:
+            for record in self.records:
+                f.write(json.dumps(record, default=str) + '\n')
+
+    def write_chrome(self, path):
+        """Chrome trace-event JSON: stages as complete events, iterations as counters."""
+        events = []
+        for r in self.records:
+            base = {'name': r['name'], 'ts': r['ts_us'], 'pid': r['pid'], 'tid': r['tid']}
+            if r['type'] == 'stage':
+                args = dict(r['attrs'], cpu_s=r['cpu_s'], rss_after=r['rss_after'], peak_rss=r['peak_rss'])
+                events.append(dict(base, ph='X', dur=r['dur_us'], args=args))
+            elif r['name'].endswith('.iteration'):
+                counters = {k: v for k, v in r['attrs'].items() if k != 'iteration'}
+                events.append(dict(base, ph='C', args=counters))
+            else:
+                events.append(dict(base, ph='i', s='t', args=r['attrs']))
+        with open(path, 'w') as f:
+            json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f, default=str)
+
+
+_tracer = Tracer(enabled=False)
+
+
+def get_tracer():
+    return _tracer
+
+
+def set_tracer(tracer):
+    global _tracer
+    _tracer = tracer
+    return tracer
+
+
+def enable():
+    """Install and return a fresh recording tracer."""
+    return set_tracer(Tracer())
+
+
+def disable():
+    return set_tracer(Tracer(enabled=False))
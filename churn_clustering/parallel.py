@@ -0,0 +1,90 @@
+"""Process-pool helpers for sharing one read-only array between workers."""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+
+import numpy as np
+
+
+class SharedArray:
+    """A copy of an array placed in a named shared-memory block.
+
+    The owner creates the block once; workers call ``attach`` with the
+    picklable ``descriptor`` and get a zero-copy, read-only view.
+    """
+
+    def __init__(self, array):
+        array = np.ascontiguousarray(array)
+        self._shm = shared_memory.SharedMemory(create=True, size=max(array.nbytes, 1))
+        view = np.ndarray(array.shape, dtype=array.dtype, buffer=self._shm.buf)
+        view[...] = array
+        self.descriptor = (self._shm.name, array.shape, array.dtype.str)
+
+    def close(self):
+        self._shm.close()
+        self._shm.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Handles opened by attach() must outlive the views built on top of them
+_attached = {}
+
+
+def attach(descriptor):
+    # Return a read-only view of a block created by SharedArray
+    name, shape, dtype = descriptor
+    if name not in _attached:
+        _attached[name] = shared_memory.SharedMemory(name=name)
+    view = np.ndarray(shape, dtype=np.dtype(dtype), buffer=_attached[name].buf)
+    view.flags.writeable = False
+    return view
+
+
+_X = None
+_limits = None
+
+
+def _limit_threads():
+    # Keep native thread pools to one thread per process
+    global _limits
+    try:
+        from threadpoolctl import threadpool_limits
+        _limits = threadpool_limits(1)
+    except ImportError:
+        pass
+
+
+def _init_worker(descriptor):
+    # Attach the shared matrix for worker_array()
+    global _X
+    _X = attach(descriptor)
+    _limit_threads()
+
+
+def worker_array():
+    # The shared matrix attached by the pool initializer
+    return _X
+
+
+def resolve_jobs(n_jobs, n_tasks):
+    # None or -1 means one process per core, never more than there are tasks
+    if n_jobs is None or n_jobs < 0:
+        n_jobs = os.cpu_count() or 1
+    return max(1, min(n_jobs, n_tasks))
+
+
+def pool(n_jobs):
+    # Process pool for tasks that bring their own data, one native thread per worker
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=_limit_threads)
+
+
+def shared_pool(shared, n_jobs):
+    # Process pool whose workers all see ``shared`` through worker_array()
+    return ProcessPoolExecutor(max_workers=n_jobs, initializer=_init_worker,
+                               initargs=(shared.descriptor,))
@@ -0,0 +1,299 @@
+"""The code.py analysis as a chain of cached stages.
+
+Every stage is keyed on the source file's identity (path, size and mtime),
+its version in ``VERSIONS``, its own parameters and the keys of the stages it
+depends on::
+
+    ingest -> profile -> checks
+                      -> scale -> sweep -> select
+                               -> fit -> labels -> silhouette
+                               (-> coreset, feeding sweep, select and fit when enabled)
+                                                -> churn  (with the source's text columns)
+                               -> pca ---------> projection (with fit)
+
+Small outputs are stored in an ArtifactCache, so changing a parameter only
+invalidates the stages downstream of it and repeating a run recomputes no
+model.  The data matrices never enter it: ``ingest`` memory-maps the ingest
+column cache (profiling the rows in the same pass when the profile is not
+cached yet), ``scale`` stores only the moments and standardizes in memory,
+``labels`` reuses the fit's labels in the process that fitted and is one
+nearest-centroid pass otherwise, and ``projection`` holds only the projected
+centroids (stream the points with ``pca().iter_transform``).  Given ``prepared``, a directory written
+by ``prepared.save``, the scale stage memory-maps that data set instead of
+ingesting and standardizing the CSV; it is keyed on the data's digest.
+Given a ``coreset`` size, sweep, select and fit learn from a weighted
+coreset of ``X_scaled`` drawn after scaling, and the fit labels every row in
+one nearest-centroid pass.  ``computed`` lists the stages that ran in this
+process, including the in-memory ingest and labels.  Every stage is wrapped
+in the active tracer from the instrument module.
+"""
+
+import numpy as np
+
+from . import COLUMNS, churn, coreset as coresets, ingest, prepared as prepared_data, quality
+from .instrument import get_tracer
+from .cache import MISSING, ArtifactCache, fingerprint, file_identity
+from .restarts import fit as fit_restarts
+from .selection import select_k
+from .projection import Projection
+from .silhouette import score as silhouette_score
+from .sweep import sweep
+
+# Bump a stage's version when its output changes for the same inputs, so pickles of the old output are
+# not served: silhouette 2 ignores empty clusters, churn 2 keeps "None" and "NA" as levels, fit 2 and
+# projection 2 no longer hold per-row arrays
+VERSIONS = {'silhouette': 2, 'churn': 2, 'fit': 2, 'projection': 2}
+
+
+class Pipeline:
+
+    def __init__(self, path='churn_clean.csv', columns=COLUMNS, cache=None, kvalues=range(1, 11),
+                 n_clusters=4, random_state=None, n_jobs=None, silhouette='sampled', engine='sklearn',
+                 dtype=np.float64, prepared=None, n_init=1, init='k-means++', ingest_cache='.cache/ingest',
+                 coreset=None):
+        self.path = path
+        self.prepared = prepared
+        self.columns = list(columns)
+        self.cache = cache if cache is not None else ArtifactCache()
+        self.kvalues = [int(k) for k in kvalues]
+        self.n_clusters = n_clusters
+        self.random_state = random_state
+        self.n_jobs = n_jobs
+        self.silhouette_method = silhouette
+        self.engine = engine
+        self.n_init = n_init
+        self.init = init
+        self.ingest_cache = ingest_cache
+        self.coreset_size = coreset
+        self.dtype = np.dtype(dtype)
+        self.computed = []
+        self._keys = {}
+        self._values = {}
+        self._scaled = {}
+        self._profiled = None
+        self._fit_labels = {}
+
+    def _stage(self, name, params, upstream, compute, store=True):
+        # Look the stage up by key in memory, then on disk, computing it only on a miss;
+        # store=False stages are rebuilt in each process and never reach the artifact cache
+        key = fingerprint(name, VERSIONS.get(name, 1), params, [self._keys[u] for u in upstream])
+        self._keys[name] = key
+        if key in self._values:
+            return self._values[key]
+        with get_tracer().stage(name) as span:
+            value = self.cache.get(key) if store else MISSING
+            span['cached'] = value is not MISSING
+            if value is MISSING:
+                value = compute()
+                if store:
+                    self.cache.put(key, value)
+                self.computed.append(name)
+            # Array outputs are summarised in the trace by shape and size
+            items = value.items() if isinstance(value, dict) else enumerate(
+                value if isinstance(value, tuple) else [value])
+            for label, item in items:
+                if isinstance(item, np.ndarray):
+                    span['output.{}'.format(label)] = item
+        self._values[key] = value
+        return value
+
+    def _source_key(self):
+        # The source is identified by path, size and mtime, like the ingest cache, not by hashing its bytes
+        if 'source' not in self._keys:
+            self._keys['source'] = file_identity(self.path)
+        return self._keys['source']
+
+    def _ingest_params(self):
+        return {'columns': self.columns, 'dtype': self.dtype.str}
+
+    def ingest(self):
+        """``(index, X)`` read from the memory-mapped column cache (or the CSV without one).
+
+        The matrix is never pickled into the artifact cache.  When the profile
+        is not cached yet it is gathered in the same pass.
+        """
+        def compute():
+            profile_key = fingerprint('profile', self._ingest_params(), [self._keys['source']])
+            profile = None if profile_key in self.cache else quality.Profile(self.columns)
+            index, X = ingest.load_matrix(self.path, self.columns, cache_dir=self.ingest_cache, dtype=self.dtype,
+                                          profile=profile)
+            if profile is not None:
+                self._profiled = profile.finish()
+            return index, X
+        self._source_key()
+        return self._stage('ingest', self._ingest_params(), ['source'], compute, store=False)
+
+    def profile(self):
+        """The QualityReport gathered during ingestion."""
+        def compute():
+            X = self.ingest()[1]
+            report, self._profiled = self._profiled, None
+            if report is None:
+                # The cached profile vanished after ingest checked for it: profile the matrix again
+                profile = quality.Profile(self.columns)
+                for start in range(0, len(X), ingest.CHUNKSIZE):
+                    profile.update(X[start:start + ingest.CHUNKSIZE])
+                report = profile.finish()
+            return report
+        self._source_key()
+        return self._stage('profile', self._ingest_params(), ['source'], compute)
+
+    def checks(self):
+        def compute():
+            report = self.profile()
+            return {'na': report.nulls, 'duplicates': report.duplicates, 'describe': report.describe()}
+        self.profile()
+        return self._stage('checks', {}, ['profile'], compute)
+
+    def _open_prepared(self):
+        # Memory-map the exported data set and register it under its content digest
+        if 'scale' not in self._keys:
+            data = prepared_data.load(self.prepared)
+            self.columns = list(data.columns)
+            self.dtype = data.X_scaled.dtype
+            key = fingerprint('prepared', data.digest)
+            self._keys['scale'] = key
+            self._values[key] = {'mean': data.mean, 'scale': data.scale, 'X_scaled': data.X_scaled}
+        return self._values[self._keys['scale']]
+
+    def scale(self):
+        """``mean``, ``scale`` and ``X_scaled``; only the moments are kept in the artifact cache."""
+        if self.prepared is not None:
+            return self._open_prepared()
+
+        def compute():
+            # Reuse the float64 moments profiled at ingestion instead of refitting them
+            scaler = self.profile().scaler()
+            return {'mean': scaler.mean_, 'scale': scaler.scale_}
+        self.profile()
+        moments = self._stage('scale', {}, ['profile'], compute)
+        key = self._keys['scale']
+        if key not in self._scaled:
+            # Standardizing is one vectorised pass, cheaper than storing and reloading a second matrix
+            with get_tracer().stage('scale.transform') as span:
+                X = self.ingest()[1]
+                mean, scale = moments['mean'].astype(self.dtype), moments['scale'].astype(self.dtype)
+                X_scaled = ((X - mean) / scale).astype(self.dtype, copy=False)
+                span['output.X_scaled'] = X_scaled
+            self._scaled[key] = dict(moments, X_scaled=X_scaled)
+        return self._scaled[key]
+
+    def coreset(self):
+        def compute():
+            # Scaled moments follow from the profile, so the coreset is drawn in one pass;
+            # a prepared data set has no profile and gets an extra moments pass
+            moments = None
+            if self.prepared is None:
+                report = self.profile()
+                moments = coresets.scaled_moments(report.rows, report.var, self.scale()['scale'])
+            return coresets.build(self.scale()['X_scaled'], self.coreset_size, moments, self.random_state,
+                                  dtype=self.dtype)
+        self.scale()
+        return self._stage('coreset', {'size': self.coreset_size, 'random_state': self.random_state}, ['scale'],
+                           compute)
+
+    def _training(self):
+        # The rows sweep, select and fit learn from: X_scaled, or its coreset and weights
+        if self.coreset_size is None:
+            return self.scale()['X_scaled'], None, ['scale']
+        sample = self.coreset()
+        return sample.points, sample.weights, ['scale', 'coreset']
+
+    def sweep(self):
+        X, weights, upstream = self._training()
+        return self._stage('sweep', {'kvalues': self.kvalues, 'random_state': self.random_state,
+                                     'silhouette': self.silhouette_method, 'engine': self.engine}, upstream,
+                           lambda: sweep(X, self.kvalues, n_jobs=self.n_jobs, random_state=self.random_state,
+                                         silhouette=self.silhouette_method, engine=self.engine,
+                                         sample_weight=weights))
+
+    def select(self, gap=True):
+        """Recommended k for the sweep's range, with the per-k justification table."""
+        X, weights, upstream = self._training()
+
+        def compute():
+            bounds = None
+            if weights is not None and self.prepared is None:
+                # The gap statistic's reference box comes from every row, not just the coreset's
+                report, scaled = self.profile(), self.scale()
+                bounds = [(b - scaled['mean']) / scaled['scale'] for b in (report.min, report.max)]
+            return select_k(X, self.sweep(), gap=gap, n_jobs=self.n_jobs, random_state=self.random_state,
+                            sample_weight=weights, bounds=bounds)
+        self.sweep()
+        return self._stage('select', {'gap': gap, 'random_state': self.random_state}, upstream + ['sweep'],
+                           compute)
+
+    def fit(self):
+        X, weights, upstream = self._training()
+
+        def compute():
+            # Best of n_init seeded restarts, clusters numbered canonically
+            fitted = fit_restarts(X, self.n_clusters, n_init=self.n_init, init=self.init, engine=self.engine,
+                                  n_jobs=self.n_jobs, random_state=self.random_state, sample_weight=weights).fit
+            get_tracer().record_fit('fit', fitted)
+            labels, inertia = fitted.labels, fitted.inertia
+            if weights is not None:
+                # Label every row against the coreset's centres; inertia is the full-data cost
+                labels, inertia = coresets.assign(self.scale()['X_scaled'], fitted.centers)
+            # The labels stay in memory for the labels stage; only the small fit reaches the cache
+            self._fit_labels[self._keys['fit']] = labels
+            return {'centers': fitted.centers, 'inertia': inertia, 'n_iter': fitted.n_iter}
+        return self._stage('fit', {'n_clusters': self.n_clusters, 'random_state': self.random_state,
+                                   'engine': self.engine, 'n_init': self.n_init, 'init': self.init},
+                           upstream, compute)
+
+    def coreset_error(self):
+        """Cost of the coreset solution against a fit on every row (see coreset.evaluate)."""
+        def compute():
+            return coresets.evaluate(self.scale()['X_scaled'], self.coreset(), self.n_clusters, engine=self.engine,
+                                     n_init=self.n_init, init=self.init, random_state=self.random_state)
+        self.coreset()
+        return self._stage('coreset_error', {'n_clusters': self.n_clusters, 'engine': self.engine,
+                                             'n_init': self.n_init, 'init': self.init,
+                                             'random_state': self.random_state},
+                           ['scale', 'coreset'], compute)
+
+    def labels(self):
+        def compute():
+            labels = self._fit_labels.pop(self._keys['fit'], None)
+            if labels is None:
+                # The fit came from the cache: its centres label every row in one blocked pass
+                labels = coresets.assign(self.scale()['X_scaled'], self.fit()['centers'])[0]
+            return np.asarray(labels)
+        self.fit()
+        return self._stage('labels', {}, ['fit'], compute, store=False)
+
+    def pca(self):
+        def compute():
+            return Projection.fit(self.scale()['X_scaled'], 2, random_state=self.random_state)
+        self.scale()
+        return self._stage('pca', {'n_components': 2, 'method': 'covariance'}, ['scale'], compute)
+
+    def projection(self):
+        """The centroids in the PCA plane; stream the points with ``pca().iter_transform``."""
+        def compute():
+            return {'centers': self.pca().transform(self.fit()['centers'])}
+        self.pca()
+        self.fit()
+        return self._stage('projection', {}, ['pca', 'fit'], compute)
+
+    def silhouette(self):
+        def compute():
+            extra = {'random_state': self.random_state} if self.silhouette_method == 'sampled' else {}
+            return silhouette_score(self.scale()['X_scaled'], self.labels(), self.fit()['centers'],
+                                    method=self.silhouette_method, **extra)
+        self.labels()
+        self.fit()
+        return self._stage('silhouette', {'method': self.silhouette_method}, ['labels', 'fit'], compute)
+
+    def churn(self, categorical=churn.CATEGORICAL):
+        def compute():
+            return churn.report(self.labels(), self.path, categorical, self.ingest_cache, k=self.n_clusters)
+        self._source_key()
+        self.labels()
+        return self._stage('churn', {'categorical': list(categorical)}, ['source', 'labels'], compute)
+
+    def run(self):
+        """Run every stage and return their outputs by name."""
+        return {'checks': self.checks(), 'sweep': self.sweep(), 'fit': self.fit(), 'labels': self.labels(),
+                'projection': self.projection(), 'silhouette': self.silhouette()}
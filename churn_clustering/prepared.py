@@ -0,0 +1,109 @@
+"""Binary export of the prepared (standardized) data set.
+
+code.py writes ``X_scaled`` with ``DataFrame.to_csv``, which formats every
+float as text, rounds it, and makes each consumer parse the file back.  Here
+the prepared data set is a directory::
+
+    X_scaled.npy   the (rows, columns) matrix, C-ordered
+    index.npy      the CaseOrder of each row
+    meta.json      columns, dtype, the scaler's mean and scale, content digest
+
+``load`` opens both arrays with ``np.load(mmap_mode='r')``, so the matrix is
+mapped rather than read and stages can start on it at once.  The directory is
+written under a temporary name and published with ``os.replace``; a previous
+export is moved aside first and removed only once the new one is in place.
+``save`` refuses to replace a directory that is neither empty nor an export.
+"""
+
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+from dataclasses import dataclass
+
+import numpy as np
+
+BLOCK = 65536
+
+
+@dataclass
+class Prepared:
+    index: np.ndarray
+    X_scaled: np.ndarray
+    mean: np.ndarray
+    scale: np.ndarray
+    columns: list
+    digest: str
+
+
+def save(directory, X_scaled, mean, scale, columns, index=None, block=BLOCK):
+    """Write a prepared data set to ``directory``, replacing any previous one.
+
+    Raises FileExistsError if ``directory`` exists and is neither empty nor
+    a prepared data set.  Rows are copied into the memory-mapped ``.npy`` ``block`` at a time and
+    hashed as they go; the digest identifies the data in later cache keys.
+    """
+    directory = os.path.abspath(directory)
+    if os.path.lexists(directory) and not (is_prepared(directory) or _is_empty_dir(directory)):
+        raise FileExistsError('{} exists and is not a prepared data set; refusing to replace it'.format(directory))
+    n_rows = len(X_scaled)
+    index = np.arange(n_rows, dtype=np.int64) if index is None else np.asarray(index, dtype=np.int64)
+    parent = os.path.dirname(directory)
+    os.makedirs(parent, exist_ok=True)
+    tmp = tempfile.mkdtemp(dir=parent, prefix='.prepared-')
+    try:
+        out = np.lib.format.open_memmap(os.path.join(tmp, 'X_scaled.npy'), mode='w+',
+                                        dtype=X_scaled.dtype, shape=(n_rows, len(columns)))
+        h = hashlib.blake2b(digest_size=16)
+        for start in range(0, n_rows, block):
+            rows = np.ascontiguousarray(X_scaled[start:start + block])
+            out[start:start + block] = rows
+            h.update(rows.tobytes())
+        out.flush()
+        del out
+        np.save(os.path.join(tmp, 'index.npy'), index)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({'rows': n_rows, 'columns': list(columns), 'dtype': np.dtype(X_scaled.dtype).str,
+                       'mean': np.asarray(mean, dtype=np.float64).tolist(),
+                       'scale': np.asarray(scale, dtype=np.float64).tolist(), 'digest': h.hexdigest()}, f)
+        _publish(tmp, directory)
+    except BaseException:
+        shutil.rmtree(tmp, ignore_errors=True)
+        raise
+    return directory
+
+
+def _is_empty_dir(path):
+    return os.path.isdir(path) and not os.path.islink(path) and not os.listdir(path)
+
+
+def _publish(tmp, directory):
+    # Move any previous export aside, put the new one in place, then drop the old one;
+    # at every point one complete export exists under ``directory`` or beside it
+    if not os.path.lexists(directory):
+        os.replace(tmp, directory)
+        return
+    old = tempfile.mkdtemp(dir=os.path.dirname(directory), prefix='.prepared-old-')
+    os.rmdir(old)
+    os.replace(directory, old)
+    try:
+        os.replace(tmp, directory)
+    except BaseException:
+        os.replace(old, directory)
+        raise
+    shutil.rmtree(old, ignore_errors=True)
+
+
+def load(directory, mmap_mode='r'):
+    """Open a prepared data set; ``X_scaled`` and ``index`` are memory maps."""
+    with open(os.path.join(directory, 'meta.json')) as f:
+        meta = json.load(f)
+    return Prepared(index=np.load(os.path.join(directory, 'index.npy'), mmap_mode=mmap_mode),
+                    X_scaled=np.load(os.path.join(directory, 'X_scaled.npy'), mmap_mode=mmap_mode),
+                    mean=np.array(meta['mean']), scale=np.array(meta['scale']),
+                    columns=meta['columns'], digest=meta['digest'])
+
+
+def is_prepared(path):
+    return os.path.isfile(os.path.join(path, 'meta.json')) and os.path.isfile(os.path.join(path, 'X_scaled.npy'))
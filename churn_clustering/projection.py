@@ -0,0 +1,115 @@
+"""Two-component PCA projection for the visualisation step.
+
+code.py fits a full ``PCA(n_components=2)`` on all of ``X_scaled`` and
+calls ``transform`` separately for the points and the centroids.  A
+Projection is fitted once per scaled data set and reused for every k:
+
+* ``covariance`` (default) accumulates the d x d scatter matrix in one
+  blocked pass and eigendecomposes it, which is exact and cheap for the 19
+  churn features however many rows there are;
+* ``randomized`` uses scikit-learn's randomized SVD solver;
+* ``incremental`` runs IncrementalPCA over chunks; it only carries
+  ``n_components`` directions between chunks, so it can drift from the exact
+  basis when the leading eigenvalues are close, as they are for this data.
+
+Points and centroids are projected in one product, and ``iter_transform``
+streams projected chunks straight into the renderers without building a
+DataFrame or the full projected array.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+
+from .streaming import BATCH_SIZE, StreamingScaler, iter_batches
+
+CHUNKSIZE = 65536
+
+
+@dataclass
+class Projection:
+    components: np.ndarray
+    mean: np.ndarray
+    explained_variance_ratio: np.ndarray
+
+    @classmethod
+    def fit(cls, X, n_components=2, method='covariance', random_state=None, chunksize=CHUNKSIZE):
+        """Fit the basis on ``X``, an array or a chunk source as in the streaming module."""
+        if method == 'covariance':
+            return cls._fit_covariance(X, n_components, chunksize)
+        if method == 'randomized':
+            from sklearn.decomposition import PCA
+            pca = PCA(n_components=n_components, svd_solver='randomized', random_state=random_state).fit(X)
+        elif method == 'incremental':
+            from sklearn.decomposition import IncrementalPCA
+            pca = IncrementalPCA(n_components=n_components)
+            for batch in iter_batches(X, max(chunksize, n_components)):
+                if len(batch) >= n_components:
+                    pca.partial_fit(batch)
+        else:
+            raise ValueError('unknown projection method: {!r}'.format(method))
+        return cls(_flip(pca.components_), pca.mean_, pca.explained_variance_ratio_)
+
+    @classmethod
+    def _fit_covariance(cls, X, n_components, chunksize):
+        # One pass: running mean and scatter matrix, merged chunk by chunk
+        moments = StreamingScaler()
+        scatter = None
+        for batch in iter_batches(X, chunksize):
+            batch_mean = batch.mean(axis=0)
+            centred = batch - batch_mean
+            batch_scatter = centred.T @ centred
+            if scatter is None:
+                scatter = batch_scatter
+            else:
+                delta = batch_mean - moments.mean_
+                n_a, n_b = moments.n_samples_seen_, len(batch)
+                scatter = scatter + batch_scatter + np.outer(delta, delta) * (n_a * n_b / (n_a + n_b))
+            moments.merge_moments(len(batch), batch_mean, np.diag(batch_scatter))
+        values, vectors = np.linalg.eigh(scatter)
+        order = np.argsort(values)[::-1][:n_components]
+        ratio = values[order] / values.sum()
+        return cls(_flip(vectors[:, order].T), moments.mean_, ratio)
+
+    def transform(self, X, centers=None):
+        """Project ``X`` and, if given, ``centers`` in one product, in X's dtype."""
+        X = np.asarray(X)
+        mean, components = self._basis(X.dtype)
+        if centers is None:
+            return (X - mean) @ components.T
+        reduced = (np.vstack([X, np.asarray(centers, dtype=X.dtype)]) - mean) @ components.T
+        return reduced[:len(X)], reduced[len(X):]
+
+    def _basis(self, dtype):
+        dtype = dtype if np.dtype(dtype).kind == 'f' else np.float64
+        return self.mean.astype(dtype, copy=False), self.components.astype(dtype, copy=False)
+
+    def iter_transform(self, X, labels=None, chunksize=BATCH_SIZE * 16):
+        """Yield projected chunks, paired with their labels when given, for the renderers."""
+        start = 0
+        dtype = getattr(X, 'dtype', np.float64)
+        mean, components = self._basis(dtype)
+        for batch in iter_batches(X, chunksize, dtype=dtype):
+            reduced = (batch - mean) @ components.T
+            if labels is None:
+                yield reduced
+            else:
+                yield reduced, np.asarray(labels[start:start + len(batch)])
+            start += len(batch)
+
+    def save(self, path):
+        np.savez(path, components=self.components, mean=self.mean,
+                 explained_variance_ratio=self.explained_variance_ratio)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data['components'], data['mean'], data['explained_variance_ratio'])
+
+
+def _flip(components):
+    # Deterministic signs: the largest-magnitude loading of each component is positive
+    components = np.array(components)
+    signs = np.sign(components[np.arange(len(components)), np.abs(components).argmax(axis=1)])
+    signs[signs == 0] = 1
+    return components * signs[:, None]
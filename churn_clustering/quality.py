@@ -0,0 +1,162 @@
+"""Data-quality profile and summary statistics gathered in one pass.
+
+code.py walks the frame four times before clustering: ``isna().any()``,
+``duplicated().sum()``, ``describe()`` and ``StandardScaler.fit``.  A
+``Profile`` is updated with each chunk as ingestion reads it and collects all
+of that at once:
+
+* null counts per column;
+* duplicate rows, found by a 64-bit hash of each row against the hashes seen
+  so far (a collision would need ~2**32 distinct rows to be likely), kept as
+  sorted runs of doubling size so each chunk costs O(chunk log n);
+* min and max, and quartiles from a uniform reservoir of rows, whose rank
+  error is about ``1/sqrt(sample_size)``;
+* mean and variance through StreamingScaler's Welford/Chan merge (NaN for a
+  column holding nulls, which the null counts flag).
+
+``finish`` returns a small ``QualityReport``, without the hash set, whose
+``scaler()`` hands the moments to the standardization step so it never
+refits them.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from .streaming import StreamingScaler
+
+SAMPLE_SIZE = 8192
+QUANTILES = (0.25, 0.5, 0.75)
+
+_FNV_OFFSET = np.uint64(0xcbf29ce484222325)
+_FNV_PRIME = np.uint64(0x100000001b3)
+
+
+def row_hashes(X):
+    """64-bit hash of every row; equal values hash equal (-0.0 as 0.0, any NaN as NaN)."""
+    X = np.asarray(X, dtype=np.float64)
+    X = np.where(np.isnan(X), np.nan, X + 0.0)
+    words = np.ascontiguousarray(X).view(np.uint64)
+    h = np.full(len(X), _FNV_OFFSET)
+    for j in range(words.shape[1]):
+        h ^= words[:, j]
+        h *= _FNV_PRIME
+        h ^= h >> np.uint64(29)
+    return h
+
+
+@dataclass
+class QualityReport:
+    columns: list
+    rows: int
+    nulls: np.ndarray
+    duplicates: int
+    min: np.ndarray
+    max: np.ndarray
+    quantiles: np.ndarray
+    mean: np.ndarray
+    var: np.ndarray
+    sample: np.ndarray = field(repr=False)
+
+    def scaler(self):
+        """A fitted StreamingScaler carrying these moments."""
+        scaler = StreamingScaler()
+        return scaler.merge_moments(self.rows, self.mean, self.var * self.rows)
+
+    def describe(self):
+        # The layout of DataFrame.describe(), with sample-estimated quartiles
+        import pandas as pd
+        count = self.rows - self.nulls
+        std = np.sqrt(self.var * self.rows / np.maximum(self.rows - 1, 1))
+        index = ['count', 'mean', 'std', 'min'] + ['{:g}%'.format(100 * q) for q in QUANTILES] + ['max']
+        return pd.DataFrame(np.vstack([count, self.mean, std, self.min, self.quantiles, self.max]),
+                            index=index, columns=self.columns)
+
+
+class _HashRuns:
+    # Set of uint64 hashes as sorted runs whose sizes at least double towards the front, like a binary
+    # counter: a hash is merged O(log n) times in all and a lookup is one searchsorted per run
+
+    def __init__(self):
+        self.runs = []
+
+    def __len__(self):
+        return sum(len(run) for run in self.runs)
+
+    def contains(self, values):
+        found = np.zeros(len(values), dtype=bool)
+        for run in self.runs:
+            i = np.minimum(np.searchsorted(run, values), len(run) - 1)
+            found |= run[i] == values
+        return found
+
+    def add(self, values):
+        # ``values`` sorted, unique and not yet in the set
+        run = values
+        while self.runs and len(self.runs[-1]) <= 2 * len(run):
+            # Both halves are sorted, which the stable sort merges in linear time
+            run = np.sort(np.concatenate([self.runs.pop(), run]), kind='stable')
+        if len(run):
+            self.runs.append(run)
+
+
+class Profile:
+
+    def __init__(self, columns, sample_size=SAMPLE_SIZE, random_state=0):
+        self.columns = list(columns)
+        k = len(self.columns)
+        self.rows = 0
+        self.nulls = np.zeros(k, dtype=np.int64)
+        self.duplicates = 0
+        self.min = np.full(k, np.inf)
+        self.max = np.full(k, -np.inf)
+        self.moments = StreamingScaler()
+        self.sample_size = sample_size
+        self._sample = np.empty((0, k))
+        self._priority = np.empty(0)
+        self._seen = _HashRuns()
+        self._rng = np.random.default_rng(random_state)
+
+    def update(self, chunk):
+        """Fold one chunk of rows (array or DataFrame) into the profile."""
+        X = np.asarray(chunk.to_numpy() if hasattr(chunk, 'to_numpy') else chunk, dtype=np.float64)
+        if not len(X):
+            return self
+        self.rows += len(X)
+        self.nulls += np.isnan(X).sum(axis=0)
+        # fmin/fmax skip NaN without warning on all-NaN columns
+        self.min = np.fmin(self.min, np.fmin.reduce(X, axis=0))
+        self.max = np.fmax(self.max, np.fmax.reduce(X, axis=0))
+        self.moments.partial_fit(X)
+
+        # A row is a duplicate if its hash repeats within the chunk or was seen before
+        uniq, counts = np.unique(row_hashes(X), return_counts=True)
+        seen = self._seen.contains(uniq)
+        self.duplicates += int((counts - 1).sum()) + int(seen.sum())
+        self._seen.add(uniq[~seen])
+
+        # Bottom-k random priorities keep a uniform sample of every row seen
+        priority = np.concatenate([self._priority, self._rng.random(len(X))])
+        rows = np.vstack([self._sample, X])
+        if len(priority) > self.sample_size:
+            keep = np.argpartition(priority, self.sample_size)[:self.sample_size]
+            priority, rows = priority[keep], rows[keep]
+        self._priority, self._sample = priority, rows
+        return self
+
+    def finish(self):
+        """Return the QualityReport; the profile can keep being updated."""
+        k = len(self.columns)
+        quantiles = np.full((len(QUANTILES), k), np.nan)
+        for j in range(k):
+            values = self._sample[:, j][~np.isnan(self._sample[:, j])]
+            if len(values):
+                quantiles[:, j] = np.quantile(values, QUANTILES)
+        missing = self.nulls == self.rows
+        return QualityReport(columns=self.columns, rows=self.rows, nulls=self.nulls.copy(),
+                             duplicates=self.duplicates,
+                             min=np.where(missing, np.nan, self.min), max=np.where(missing, np.nan, self.max),
+                             quantiles=quantiles,
+                             mean=np.full(k, np.nan) if not self.rows else self.moments.mean_.copy(),
+                             var=np.full(k, np.nan) if not self.rows else self.moments.var_.copy(),
+                             sample=self._sample.copy())
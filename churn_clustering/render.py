@@ -0,0 +1,223 @@
+"""Scalable renderers for the factorial-plane and parallel-coordinates plots.
+
+The notebook functions draw one artist per point or per row
+(``plt.text`` per label, ``pandas.plotting.parallel_coordinates`` one Line2D
+per row, redrawn once per cluster).  Here every cluster is first reduced to a
+fixed visual budget with a mergeable bottom-k sample, then drawn with a single
+PathCollection (scatter) or LineCollection per cluster, or as a pre-binned
+density raster.  Drawing cost therefore depends on the budget, not on the
+number of rows.
+
+Figures are built with ``matplotlib.figure.Figure`` rather than pyplot, so
+they render headlessly and can be saved from worker processes.
+"""
+
+import numpy as np
+from matplotlib.collections import LineCollection
+from matplotlib.colors import to_rgba
+from matplotlib.figure import Figure
+
+PALETTE = ['#023eff', '#ff7c00', '#1ac938', '#e8000b', '#8b2be2',
+           '#9f4800', '#f14cc1', '#a3a3a3', '#ffc400', '#00d7ff']  # seaborn "bright"
+BUDGET = 2000
+
+
+def _color(palette, i, alpha):
+    return to_rgba(palette[i % len(palette)], alpha)
+
+
+class ClusterSample:
+    """Uniform per-cluster sample of at most ``budget`` rows, fed chunk by chunk.
+
+    Each row gets a random key and every cluster keeps the rows with the
+    ``budget`` smallest keys, which is a uniform sample of everything seen so
+    far regardless of how the rows were chunked.
+    """
+
+    def __init__(self, budget=BUDGET, random_state=None):
+        self.budget = budget
+        self.rng = np.random.default_rng(random_state)
+        self.keys = {}
+        self.rows = {}
+        self.counts = {}
+
+    def add(self, rows, labels):
+        rows = np.asarray(rows)
+        labels = np.asarray(labels)
+        keys = self.rng.random(len(rows))
+        for c in np.unique(labels):
+            mask = labels == c
+            c = int(c)
+            self.counts[c] = self.counts.get(c, 0) + int(mask.sum())
+            k = np.concatenate([self.keys.get(c, np.empty(0)), keys[mask]])
+            r = np.concatenate([self.rows[c], rows[mask]]) if c in self.rows else rows[mask]
+            if len(k) > self.budget:
+                keep = np.argpartition(k, self.budget)[:self.budget]
+                k, r = k[keep], r[keep]
+            self.keys[c], self.rows[c] = k, r
+        return self
+
+    @classmethod
+    def of(cls, rows, labels, budget=BUDGET, random_state=None, chunksize=1 << 20):
+        # Sample a whole array, or any iterable of (rows, labels) chunks when ``labels`` is None
+        sample = cls(budget, random_state)
+        chunks = rows if labels is None else (
+            (rows[i:i + chunksize], labels[i:i + chunksize]) for i in range(0, len(rows), chunksize))
+        for chunk_rows, chunk_labels in chunks:
+            sample.add(chunk_rows, chunk_labels)
+        return sample
+
+    def clusters(self):
+        return sorted(self.rows)
+
+
+class DensityGrid:
+    """Per-cluster 2-D histograms over a fixed extent, accumulated chunk by chunk."""
+
+    def __init__(self, extent, bins=300):
+        self.extent = extent
+        self.bins = bins
+        self.grids = {}
+
+    def add(self, points, labels):
+        x0, x1, y0, y1 = self.extent
+        for c in np.unique(labels):
+            mask = labels == c
+            h, _, _ = np.histogram2d(points[mask, 0], points[mask, 1], bins=self.bins, range=[[x0, x1], [y0, y1]])
+            self.grids[int(c)] = self.grids.get(int(c), 0) + h
+        return self
+
+    def image(self, palette=PALETTE):
+        # Blend clusters into one RGBA raster: colour by the dominant cluster, opacity by log density
+        clusters = sorted(self.grids)
+        stack = np.stack([self.grids[c] for c in clusters])
+        total = stack.sum(axis=0)
+        colors = np.array([_color(palette, c, 1.0) for c in clusters])
+        rgba = colors[stack.argmax(axis=0)]
+        rgba[..., 3] = np.log1p(total) / max(np.log1p(total.max()), 1e-12)
+        return np.transpose(rgba, (1, 0, 2))
+
+
+def _boundary(points):
+    return float(np.max(np.abs(points))) * 1.1 if len(points) else 1.0
+
+
+def factorial_plane(points, clusters, centers=None, variance_ratio=None, dims=(0, 1), budget=BUDGET,
+                    density=False, alpha=0.8, palette=PALETTE, random_state=0, ax=None, extent=None):
+    """Scatter (or density raster) of the projected points, coloured by cluster.
+
+    ``points`` is either an (n, >=2) array with ``clusters`` its labels, or an
+    iterable of ``(points, labels)`` chunks with ``clusters=None``; chunked
+    input needs ``extent`` (``boundary`` or ``(x0, x1, y0, y1)``) for density
+    mode.  Centroids, if given, are drawn as white squares.
+    """
+    d1, d2 = dims
+    if ax is None:
+        ax = Figure(figsize=(7, 6)).add_subplot()
+    chunks = [(points, clusters)] if clusters is not None else points
+    if density and extent is None:
+        points = np.asarray(points)
+        extent = _boundary(points[:, [d1, d2]])
+    if np.isscalar(extent):
+        extent = (-extent, extent, -extent, extent)
+
+    sample = ClusterSample(budget, random_state)
+    grid = DensityGrid(extent) if density else None
+    for chunk_points, chunk_labels in chunks:
+        xy = np.asarray(chunk_points)[:, [d1, d2]]
+        chunk_labels = np.asarray(chunk_labels)
+        if density:
+            grid.add(xy, chunk_labels)
+        else:
+            sample.add(xy, chunk_labels)
+
+    if density:
+        ax.imshow(grid.image(palette), extent=extent, origin='lower', aspect='auto', interpolation='nearest')
+        boundary = max(abs(v) for v in extent)
+    else:
+        # One PathCollection for every cluster together
+        rows = [sample.rows[c] for c in sample.clusters()]
+        xy = np.concatenate(rows) if rows else np.empty((0, 2))
+        colors = np.concatenate([np.repeat([_color(palette, c, alpha)], len(sample.rows[c]), axis=0)
+                                 for c in sample.clusters()]) if rows else None
+        order = np.random.default_rng(random_state).permutation(len(xy))
+        ax.scatter(xy[order, 0], xy[order, 1], c=colors[order] if colors is not None else None, s=12,
+                   linewidths=0)
+        for c in sample.clusters():
+            ax.scatter([], [], color=_color(palette, c, 1.0), label=str(c))
+        ax.legend()
+        boundary = extent[1] if extent is not None else _boundary(xy)
+
+    if centers is not None:
+        centers = np.asarray(centers)
+        ax.scatter(centers[:, d1], centers[:, d2], marker='s', color='w', edgecolors='k', zorder=10)
+
+    ax.set_xlim([-boundary, boundary])
+    ax.set_ylim([-boundary, boundary])
+    ax.axhline(0, color='grey', ls='--')
+    ax.axvline(0, color='grey', ls='--')
+    if variance_ratio is not None:
+        ax.set_xlabel('PC{} ({}%)'.format(d1 + 1, round(100 * variance_ratio[d1], 1)))
+        ax.set_ylabel('PC{} ({}%)'.format(d2 + 1, round(100 * variance_ratio[d2], 1)))
+    ax.set_title('Projection of points (on PC{} and PC{})'.format(d1 + 1, d2 + 1))
+    return ax.figure
+
+
+def _segments(rows):
+    # Polyline vertices (row index along x, value along y) for every sampled row
+    xs = np.broadcast_to(np.arange(rows.shape[1]), rows.shape)
+    return np.stack([xs, rows], axis=-1)
+
+
+def _axes_style(ax, columns):
+    ax.set_xticks(range(len(columns)))
+    ax.set_xticklabels(columns)
+    ax.set_xlim(0, len(columns) - 1)
+    for x in range(len(columns)):
+        ax.axvline(x, color='black', linewidth=0.8)
+    # Stagger the axis labels
+    for tick in ax.xaxis.get_major_ticks()[1::2]:
+        tick.set_pad(20)
+    ax.grid(False)
+
+
+def parallel_coordinates(X, clusters, columns, budget=500, palette=PALETTE, random_state=0):
+    """One subplot per cluster, that cluster's lines drawn over the others'.
+
+    Each cluster is sampled once to ``budget`` rows and drawn as a single
+    LineCollection per subplot layer.  ``X`` may be an array with
+    ``clusters`` its labels, or an iterable of chunks with ``clusters=None``.
+    """
+    sample = ClusterSample.of(X, clusters, budget, random_state)
+    ids = sample.clusters()
+    fig = Figure(figsize=(16, 15))
+    fig.suptitle('Parallel Coordinates Plot for the Clusters', fontsize=18)
+    fig.subplots_adjust(top=0.95, wspace=0)
+    low = min(float(sample.rows[c].min()) for c in ids)
+    high = max(float(sample.rows[c].max()) for c in ids)
+    for i, c in enumerate(ids):
+        ax = fig.add_subplot(len(ids), 1, i + 1)
+        for j in ids:
+            if j != c:
+                ax.add_collection(LineCollection(_segments(sample.rows[j]), colors=[_color(palette, j, 0.2)],
+                                                 linewidths=1))
+        ax.add_collection(LineCollection(_segments(sample.rows[c]), colors=[_color(palette, c, 0.5)],
+                                         linewidths=1, label=str(c)))
+        ax.set_ylim(low, high)
+        ax.legend(loc='upper right')
+        _axes_style(ax, columns)
+    return fig
+
+
+def parallel_coordinates_centroids(centers, columns, palette=PALETTE):
+    """Parallel coordinates plot of the k centroids, one line each."""
+    centers = np.asarray(centers)
+    fig = Figure(figsize=(16, 5))
+    fig.suptitle('Parallel Coordinates plot for the Centroids', fontsize=18)
+    fig.subplots_adjust(top=0.9, wspace=0)
+    ax = fig.add_subplot()
+    for c, row in enumerate(centers):
+        ax.plot(range(len(columns)), row, color=_color(palette, c, 1.0), label=str(c))
+    ax.legend(loc='upper right')
+    _axes_style(ax, columns)
+    return fig
@@ -0,0 +1,82 @@
+"""Multi-restart k-means over a process pool, with canonical cluster ids.
+
+code.py fits a single unseeded ``KMeans(n_clusters=4)``, so both the
+solution and the numbering of its clusters change from run to run.  ``fit``
+draws one seed per restart from ``random_state``, runs the restarts
+independently (in a pool sharing one copy of ``X``, as the sweep does), keeps
+the lowest inertia and renumbers the clusters canonically: largest first,
+ties broken by the centroid's coordinates.  The result depends only on the
+data, the parameters and ``random_state``, never on ``n_jobs``.
+"""
+
+import time
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from . import parallel
+from .engines import FitResult, get_engine, init_centers
+
+
+@dataclass
+class RestartResult:
+    fit: FitResult
+    # One entry per restart, in seed order
+    seeds: np.ndarray
+    inertia: np.ndarray
+    best: int
+    seconds: float = field(default=0.0)
+
+
+def canonical_order(centers, labels, sample_weight=None):
+    """Renumber clusters by size (descending), then lexicographically by centroid.
+
+    Returns ``(centers, labels)`` with cluster 0 the largest.
+    """
+    k = len(centers)
+    sizes = np.bincount(labels, weights=sample_weight, minlength=k)
+    # np.lexsort sorts by its last key first
+    order = np.lexsort(tuple(centers[:, j] for j in range(centers.shape[1] - 1, -1, -1)) + (-sizes,))
+    rank = np.empty(k, dtype=np.intp)
+    rank[order] = np.arange(k)
+    return centers[order], rank[labels]
+
+
+def _restart(X, n_clusters, seed, params, sample_weight):
+    engine = get_engine(params['engine'], max_iter=params['max_iter'], tol=params['tol'])
+    init = init_centers(X, n_clusters, params['init'], seed, sample_weight)
+    return engine.fit(X, n_clusters, init=init, random_state=seed, sample_weight=sample_weight)
+
+
+def _pool_restart(n_clusters, seed, params, sample_weight):
+    return _restart(parallel.worker_array(), n_clusters, seed, params, sample_weight)
+
+
+def fit(X, n_clusters, n_init=10, init='k-means||', engine='lloyd', n_jobs=None, random_state=None,
+        max_iter=300, tol=1e-4, sample_weight=None):
+    """Run ``n_init`` seeded restarts of ``engine`` and keep the best by inertia.
+
+    ``init`` is any seeding the engines accept.  ``n_jobs=1`` runs in-process;
+    otherwise restarts are spread over a process pool.  Returns a
+    RestartResult whose ``fit`` holds the winning FitResult in canonical order.
+    """
+    start = time.perf_counter()
+    X = np.ascontiguousarray(X)
+    seeds = np.random.default_rng(random_state).integers(2 ** 31 - 1, size=n_init)
+    params = dict(engine=engine, init=init, max_iter=max_iter, tol=tol)
+
+    n_jobs = parallel.resolve_jobs(n_jobs, n_init)
+    if n_jobs == 1:
+        fits = [_restart(X, n_clusters, int(s), params, sample_weight) for s in seeds]
+    else:
+        with parallel.SharedArray(X) as shared, parallel.shared_pool(shared, n_jobs) as pool:
+            futures = [pool.submit(_pool_restart, n_clusters, int(s), params, sample_weight) for s in seeds]
+            fits = [f.result() for f in futures]
+
+    inertia = np.array([f.inertia for f in fits])
+    # argmin returns the first restart among equal inertias, keeping ties deterministic
+    best = int(np.argmin(inertia))
+    winner = fits[best]
+    winner.centers, winner.labels = canonical_order(winner.centers, np.asarray(winner.labels), sample_weight)
+    return RestartResult(fit=winner, seeds=seeds, inertia=inertia, best=best,
+                         seconds=time.perf_counter() - start)
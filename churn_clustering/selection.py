@@ -0,0 +1,165 @@
+"""Automatic choice of k from a sweep.
+
+code.py picks k=4 by eye from an elbow plot.  ``select_k`` scores every k of
+a SweepResult with several criteria and lets them vote:
+
+* knee      the Kneedle point of the normalised inertia curve;
+* ch        Calinski-Harabasz, highest wins;
+* db        Davies-Bouldin, lowest wins;
+* gap       Tibshirani's gap statistic, the smallest k with
+            gap(k) >= gap(k+1) - s(k+1);
+* silhouette  the sweep's per-k score, when it has one.
+
+CH and DB need only the centroids: one blocked nearest-centre pass per k
+gives the cluster sizes and within-cluster distances, so each k costs
+O(n*k).  The gap statistic's reference data sets are drawn uniformly over
+the data's bounding box and fitted in a process pool; each has at most
+``reference_size`` rows, and its dispersion is rescaled to n rows (the
+within-cluster sum grows linearly with the row count).  The most voted k is
+recommended.  Ties go to the gap statistic's pick, the only criterion tested
+against a null reference, then the knee's, then the smaller k.
+
+With ``sample_weight`` (a coreset) every row counts with its weight, and
+the weights' total stands in for n.
+"""
+
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+from . import distance, parallel
+from .engines import get_engine
+
+N_REFERENCES = 10
+REFERENCE_SIZE = 20000
+
+
+@dataclass
+class Selection:
+    k: int
+    votes: dict
+    table: pd.DataFrame = field(repr=False)
+
+    def summary(self):
+        """The per-k table followed by each criterion's pick."""
+        picks = ', '.join('{}={}'.format(name, k) for name, k in self.votes.items())
+        return '{}\n\nrecommended k={} ({})'.format(
+            self.table.to_string(float_format=lambda v: '{:.4g}'.format(v)), self.k, picks)
+
+
+def knee(kvalues, inertia):
+    """Kneedle: the k farthest above the chord of the normalised, decreasing curve."""
+    kvalues = np.asarray(kvalues, dtype=np.float64)
+    inertia = np.asarray(inertia, dtype=np.float64)
+    if len(kvalues) < 3 or inertia[0] == inertia[-1]:
+        return np.zeros(len(kvalues)), int(kvalues[0])
+    x = (kvalues - kvalues[0]) / (kvalues[-1] - kvalues[0])
+    y = (inertia[0] - inertia) / (inertia[0] - inertia.min())
+    difference = y - x
+    return difference, int(kvalues[np.argmax(difference)])
+
+
+def internal_indices(X, centers, sample_weight=None):
+    """Calinski-Harabasz and Davies-Bouldin of the nearest-centre partition; NaN for k < 2."""
+    k = len(centers)
+    weights = np.ones(len(X)) if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    n = weights.sum()
+    labels, sq_dist = distance.nearest(X, centers)
+    counts = np.bincount(labels, weights=weights, minlength=k)
+    filled = counts > 0
+    if filled.sum() < 2:
+        return np.nan, np.nan
+    within = np.dot(weights, sq_dist)
+    mean = weights @ X / n
+    between = np.dot(counts, ((centers - mean) ** 2).sum(axis=1))
+    ch = between * (n - k) / (within * (k - 1)) if within > 0 else np.inf
+
+    # Mean distance of each cluster's rows to its centre, against the centre separations
+    scatter = np.bincount(labels, weights=weights * np.sqrt(sq_dist), minlength=k)[filled] / counts[filled]
+    c = centers[filled]
+    separation = np.sqrt(distance.squared_distances(c, c))
+    np.fill_diagonal(separation, np.inf)
+    ratio = (scatter[:, None] + scatter[None, :]) / separation
+    db = float(ratio.max(axis=1).mean())
+    return float(ch), db
+
+
+def _reference_dispersion(low, high, size, kvalues, seed, engine, n_rows):
+    # log within-cluster dispersion of one uniform reference set, for every k, rescaled to n_rows
+    rng = np.random.default_rng(seed)
+    R = rng.uniform(low, high, size=(size, len(low)))
+    fitter = get_engine(engine)
+    return [np.log(fitter.fit(R, k, random_state=int(rng.integers(2 ** 31 - 1))).inertia * n_rows / size)
+            for k in kvalues]
+
+
+def gap_statistic(X, kvalues, inertia, n_references=N_REFERENCES, reference_size=REFERENCE_SIZE, engine='lloyd',
+                  n_jobs=None, random_state=None, n_rows=None, bounds=None):
+    """Return ``(gap, s)`` arrays aligned with ``kvalues``.
+
+    ``n_rows`` is the row count ``inertia`` was summed over, ``len(X)`` by
+    default.  ``bounds`` is the ``(low, high)`` box of the full data when
+    ``X`` is only a sample of it.
+    """
+    n_rows = len(X) if n_rows is None else n_rows
+    if bounds is None:
+        bounds = np.nanmin(X, axis=0), np.nanmax(X, axis=0)
+    low, high = (np.asarray(b, dtype=np.float64) for b in bounds)
+    size = min(len(X), reference_size)
+    kvalues = [int(k) for k in kvalues]
+    seeds = [int(s) for s in np.random.default_rng(random_state).integers(2 ** 31 - 1, size=n_references)]
+    n_jobs = parallel.resolve_jobs(n_jobs, n_references)
+    if n_jobs == 1:
+        logs = [_reference_dispersion(low, high, size, kvalues, s, engine, n_rows) for s in seeds]
+    else:
+        with parallel.pool(n_jobs) as pool:
+            futures = [pool.submit(_reference_dispersion, low, high, size, kvalues, s, engine, n_rows)
+                       for s in seeds]
+            logs = [f.result() for f in futures]
+    logs = np.array(logs)
+    gap = logs.mean(axis=0) - np.log(inertia)
+    s = logs.std(axis=0) * np.sqrt(1 + 1 / n_references)
+    return gap, s
+
+
+def _gap_choice(kvalues, gap, s):
+    # Smallest k whose gap is within one standard error of the next k's
+    for i in range(len(kvalues) - 1):
+        if gap[i] >= gap[i + 1] - s[i + 1]:
+            return int(kvalues[i])
+    return int(kvalues[-1])
+
+
+def select_k(X, sweep, gap=True, n_references=N_REFERENCES, reference_size=REFERENCE_SIZE, engine='lloyd',
+             n_jobs=None, random_state=None, sample_weight=None, bounds=None):
+    """Recommend a k for ``X`` from a SweepResult; returns a Selection.
+
+    ``gap=False`` skips the gap statistic, the only criterion that fits new
+    models.
+    """
+    X = np.asarray(X)
+    kvalues = np.asarray(sweep.kvalues)
+    difference, knee_k = knee(kvalues, sweep.inertia)
+    votes = {'knee': knee_k}
+    indices = np.array([internal_indices(X, centers, sample_weight) for centers in sweep.centers])
+    table = pd.DataFrame({'inertia': sweep.inertia, 'knee': difference, 'ch': indices[:, 0],
+                          'db': indices[:, 1]}, index=pd.Index(kvalues, name='k'))
+    if np.isfinite(table['ch']).any():
+        votes['ch'] = int(table['ch'].idxmax())
+        votes['db'] = int(table['db'].idxmin())
+    if not np.isnan(sweep.silhouette).all():
+        table['silhouette'] = sweep.silhouette
+        votes['silhouette'] = int(table['silhouette'].idxmax())
+    if gap:
+        table['gap'], table['gap_s'] = gap_statistic(X, kvalues, sweep.inertia, n_references, reference_size,
+                                                     engine, n_jobs, random_state,
+                                                     None if sample_weight is None else np.sum(sample_weight),
+                                                     bounds)
+        votes['gap'] = _gap_choice(kvalues, table['gap'].to_numpy(), table['gap_s'].to_numpy())
+    table['votes'] = [sum(v == k for v in votes.values()) for k in kvalues]
+    tied = table.index[table['votes'] == table['votes'].max()]
+    for criterion in ('gap', 'knee'):
+        if votes.get(criterion) in tied:
+            return Selection(k=votes[criterion], votes=votes, table=table)
+    return Selection(k=int(tied.min()), votes=votes, table=table)
@@ -0,0 +1,389 @@
+"""Local asyncio HTTP service that assigns new customers to clusters.
+
+The fitted scaler and centroids are loaded once.  Concurrent ``/score``
+requests are queued and micro-batched: the batcher waits at most
+``max_wait`` seconds (or until ``max_batch`` rows are pending) and answers
+all of them with a single vectorised scale-and-nearest-centroid call.
+
+Endpoints::
+
+    POST /score       {"rows": [[...19 values...], ...]}
+                      or {"records": [{"Population": ..., ...}, ...]}
+                      -> {"labels": [...]}
+    POST /score-csv   a CSV with a header row; streamed back as
+                      "<first column>,cluster" lines while it is read;
+                      a bad header or first batch is a 400
+    GET  /stats       p50/p99 latency, request and row throughput
+
+Run with ``python -m churn_clustering.serve model.npz``.
+"""
+
+import asyncio
+import csv
+import io
+import json
+import time
+from collections import deque
+from dataclasses import dataclass
+
+import numpy as np
+
+from . import distance
+
+MAX_BATCH = 4096
+MAX_WAIT = 0.002
+CSV_BATCH = 8192
+
+
+@dataclass
+class ScoringModel:
+    columns: list
+    mean: np.ndarray
+    scale: np.ndarray
+    centers: np.ndarray
+
+    def assign(self, rows):
+        # Scale raw rows and return the index of the nearest centroid for each
+        X = (np.asarray(rows, dtype=self.centers.dtype) - self.mean) / self.scale
+        return distance.nearest(X, self.centers)[0]
+
+    def save(self, path):
+        np.savez(path, columns=np.array(self.columns), mean=self.mean, scale=self.scale, centers=self.centers)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(columns=[str(c) for c in data['columns']], mean=data['mean'], scale=data['scale'],
+                       centers=data['centers'])
+
+    @classmethod
+    def from_pipeline(cls, pipeline):
+        scaled = pipeline.scale()
+        return cls(columns=list(pipeline.columns), mean=scaled['mean'], scale=scaled['scale'],
+                   centers=pipeline.fit()['centers'])
+
+
+class Stats:
+    """Rolling latency percentiles and throughput since start."""
+
+    def __init__(self, window=10000):
+        self.latencies = deque(maxlen=window)
+        self.started = time.perf_counter()
+        self.requests = 0
+        self.rows = 0
+        self.batches = 0
+
+    def record(self, seconds, rows):
+        self.latencies.append(seconds)
+        self.requests += 1
+        self.rows += rows
+
+    def snapshot(self):
+        elapsed = time.perf_counter() - self.started
+        lat = np.array(self.latencies) * 1000
+        p50, p99 = np.percentile(lat, [50, 99]) if len(lat) else (float('nan'),) * 2
+        return {'requests': self.requests, 'rows': self.rows, 'batches': self.batches,
+                'p50_ms': float(p50), 'p99_ms': float(p99),
+                'requests_per_s': self.requests / elapsed, 'rows_per_s': self.rows / elapsed}
+
+
+class MicroBatcher:
+    """Collect concurrent scoring requests into one vectorised call."""
+
+    def __init__(self, model, stats, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        self.stats = stats
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self.queue = asyncio.Queue()
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+
+    async def submit(self, rows):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((rows, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self.queue.get()]
+            size = len(pending[0][0])
+            deadline = loop.time() + self.max_wait
+            # Keep collecting until the batch is full or the wait budget is spent
+            while size < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self.queue.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                pending.append(item)
+                size += len(item[0])
+            try:
+                labels = self.model.assign(np.vstack([rows for rows, _ in pending]))
+            except Exception as exc:
+                for _, future in pending:
+                    if not future.done():
+                        future.set_exception(exc)
+                continue
+            self.stats.batches += 1
+            offset = 0
+            for rows, future in pending:
+                if not future.done():
+                    future.set_result(labels[offset:offset + len(rows)])
+                offset += len(rows)
+
+
+class HTTPError(Exception):
+
+    def __init__(self, status, message):
+        super().__init__(message)
+        self.status = status
+
+
+REASONS = {200: 'OK', 400: 'Bad Request', 404: 'Not Found', 405: 'Method Not Allowed',
+           411: 'Length Required', 500: 'Internal Server Error'}
+
+
+async def _read_head(reader):
+    # Request line and headers, or None when the client closed the connection
+    line = await reader.readline()
+    if not line:
+        return None
+    try:
+        method, target, _ = line.decode('latin-1').split(' ', 2)
+    except ValueError:
+        raise HTTPError(400, 'malformed request line')
+    headers = {}
+    while True:
+        line = await reader.readline()
+        if line in (b'\r\n', b'\n', b''):
+            break
+        name, _, value = line.decode('latin-1').partition(':')
+        headers[name.strip().lower()] = value.strip()
+    return method, target.split('?', 1)[0], headers
+
+
+def _length(text, base=10):
+    # A body or chunk length; anything but a non-negative integer is the client's error
+    try:
+        length = int(text, base)
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, 'bad length {!r}'.format(text))
+    return length
+
+
+async def _iter_body(reader, headers, size=1 << 16):
+    # Yield the request body in pieces, for Content-Length or chunked encoding
+    if headers.get('transfer-encoding', '').lower() == 'chunked':
+        while True:
+            length = _length((await reader.readline()).split(b';', 1)[0].strip().decode('latin-1'), 16)
+            if length == 0:
+                await reader.readline()
+                return
+            yield await reader.readexactly(length)
+            await reader.readline()
+    if 'content-length' not in headers:
+        raise HTTPError(411, 'Content-Length required')
+    remaining = _length(headers['content-length'])
+    while remaining:
+        data = await reader.read(min(size, remaining))
+        if not data:
+            raise HTTPError(400, 'truncated body')
+        remaining -= len(data)
+        yield data
+
+
+async def _read_body(reader, headers):
+    return b''.join([piece async for piece in _iter_body(reader, headers)])
+
+
+def _response(status, body, content_type='application/json', close=False):
+    head = 'HTTP/1.1 {} {}\r\nContent-Type: {}\r\nContent-Length: {}\r\n{}\r\n'.format(
+        status, REASONS[status], content_type, len(body), 'Connection: close\r\n' if close else '')
+    return head.encode('latin-1') + body
+
+
+class ScoringServer:
+
+    def __init__(self, model, max_batch=MAX_BATCH, max_wait=MAX_WAIT):
+        self.model = model
+        self.stats = Stats()
+        self.batcher = MicroBatcher(model, self.stats, max_batch, max_wait)
+        self._server = None
+
+    async def start(self, host='127.0.0.1', port=8000):
+        self.batcher.start()
+        self._server = await asyncio.start_server(self._handle, host, port)
+        return self._server.sockets[0].getsockname()[:2]
+
+    async def stop(self):
+        self._server.close()
+        await self._server.wait_closed()
+        await self.batcher.stop()
+
+    async def serve_forever(self, host='127.0.0.1', port=8000):
+        await self.start(host, port)
+        async with self._server:
+            await self._server.serve_forever()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                try:
+                    head = await _read_head(reader)
+                    if head is None:
+                        break
+                    method, path, headers = head
+                    if path == '/score-csv' and method == 'POST':
+                        if not await self._score_csv(reader, headers, writer):
+                            break
+                    else:
+                        writer.write(await self._dispatch(method, path, reader, headers))
+                except HTTPError as exc:
+                    # The rest of the request may be unread, so the connection is not reused
+                    writer.write(_response(exc.status, json.dumps({'error': str(exc)}).encode(), close=True))
+                    await writer.drain()
+                    break
+                await writer.drain()
+                if headers.get('connection', '').lower() == 'close':
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method, path, reader, headers):
+        if path == '/stats' and method == 'GET':
+            return _response(200, json.dumps(self.stats.snapshot()).encode())
+        if path == '/score':
+            if method != 'POST':
+                raise HTTPError(405, 'use POST')
+            start = time.perf_counter()
+            rows = self._parse_rows(await _read_body(reader, headers))
+            labels = await self.batcher.submit(rows)
+            body = json.dumps({'labels': labels.tolist()}).encode()
+            self.stats.record(time.perf_counter() - start, len(rows))
+            return _response(200, body)
+        raise HTTPError(404, 'no route for {}'.format(path))
+
+    def _parse_rows(self, body):
+        try:
+            payload = json.loads(body)
+            if 'records' in payload:
+                rows = [[record[c] for c in self.model.columns] for record in payload['records']]
+            else:
+                rows = payload['rows']
+            rows = np.asarray(rows, dtype=np.float64)
+        except (ValueError, KeyError, TypeError) as exc:
+            raise HTTPError(400, 'bad scoring payload: {}'.format(exc))
+        if rows.shape == (0,):
+            rows = rows.reshape(0, len(self.model.columns))
+        if rows.ndim != 2 or rows.shape[1] != len(self.model.columns):
+            raise HTTPError(400, 'bad scoring payload: expected rows of {} values, got shape {}'.format(
+                len(self.model.columns), rows.shape))
+        return rows
+
+    async def _score_csv(self, reader, headers, writer):
+        """Label a CSV body as it arrives, answering with a chunked CSV stream.
+
+        The 200 is held back until the header and the first batch of rows
+        have been validated, so malformed uploads get a plain 400.  A bad row
+        after that ends the stream with an error line and no terminating
+        chunk; returns False when the connection must then be closed.
+        """
+        start = time.perf_counter()
+        held = []
+        started = False
+        buffer = b''
+        header = positions = None
+        rows = 0
+
+        def chunk(data):
+            return b'%x\r\n%s\r\n' % (len(data), data)
+
+        def flush():
+            nonlocal held, started
+            if not started:
+                writer.write(b'HTTP/1.1 200 OK\r\nContent-Type: text/csv\r\nTransfer-Encoding: chunked\r\n\r\n')
+                started = True
+            writer.write(b''.join(chunk(data) for data in held))
+            held = []
+
+        def label(lines):
+            records = list(csv.reader(io.StringIO(b''.join(lines).decode('utf-8'))))
+            try:
+                ids = [record[0] for record in records]
+                values = np.array([[record[p] for p in positions] for record in records], dtype=np.float64)
+            except (ValueError, IndexError) as exc:
+                raise HTTPError(400, 'bad CSV row after line {}: {}'.format(rows + 1, exc))
+            out = io.StringIO()
+            csv.writer(out, lineterminator='\n').writerows(zip(ids, self.model.assign(values).tolist()))
+            return out.getvalue().encode()
+
+        try:
+            async for piece in _iter_body(reader, headers):
+                buffer += piece
+                lines = buffer.splitlines(keepends=True)
+                # Hold back a trailing partial line until the rest of it arrives
+                buffer = lines.pop() if lines and not lines[-1].endswith(b'\n') else b''
+                if header is None and lines:
+                    header = next(csv.reader([lines.pop(0).decode('utf-8')]))
+                    missing = [c for c in self.model.columns if c not in header]
+                    if missing:
+                        raise HTTPError(400, 'CSV header lacks columns: {}'.format(', '.join(missing)))
+                    positions = [header.index(c) for c in self.model.columns]
+                    held.append('{},cluster\n'.format(header[0]).encode())
+                for i in range(0, len(lines), CSV_BATCH):
+                    batch = lines[i:i + CSV_BATCH]
+                    held.append(label(batch))
+                    rows += len(batch)
+                    flush()
+                    await writer.drain()
+            if header is None:
+                raise HTTPError(400, 'CSV body has no header row')
+            if buffer.strip():
+                held.append(label([buffer]))
+                rows += 1
+        except HTTPError as exc:
+            if not started:
+                raise
+            writer.write(chunk('error: {}\n'.format(exc).encode()))
+            return False
+        flush()
+        writer.write(b'0\r\n\r\n')
+        self.stats.record(time.perf_counter() - start, rows)
+        return True
+
+
+def main(argv=None):
+    import argparse
+    parser = argparse.ArgumentParser(description='Serve cluster assignments for new customers.')
+    parser.add_argument('model', help='model .npz written by ScoringModel.save')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--max-batch', type=int, default=MAX_BATCH)
+    parser.add_argument('--max-wait-ms', type=float, default=MAX_WAIT * 1000)
+    args = parser.parse_args(argv)
+    server = ScoringServer(ScoringModel.load(args.model), args.max_batch, args.max_wait_ms / 1000)
+    try:
+        asyncio.run(server.serve_forever(args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,292 @@
+"""Data-parallel Lloyd iterations over shard workers.
+
+Each worker holds one row partition of ``X_scaled`` and answers a
+coordinator over a ``multiprocessing.connection`` socket.  Per iteration the
+coordinator broadcasts the k centres and every worker returns only its
+per-cluster sums (k x d, float64), counts, inertia and the number of rows that
+changed cluster, so traffic is independent of the row count.  The
+coordinator follows the lloyd engine step for step (same tolerance rule, same
+stopping test, empty clusters keep their centre), so from the same initial
+centres it reaches the same centroids and inertia as a single-process fit.
+
+Workers load their partition from a shared ``.npy`` (the prepared export)
+by row range, or receive it over the connection.  Locally::
+
+    with local_workers(4) as addresses:
+        with ShardedKMeans(addresses) as model:
+            model.load_npy('churn_clean_prepared/X_scaled.npy')
+            result = model.fit(4, random_state=0)
+
+On other nodes run ``python -m churn_clustering.sharded --host 0.0.0.0
+--port 6000`` with the same secret ``CHURN_SHARD_KEY`` in the environment of
+every worker and the coordinator.  Connections carry pickles, so anyone
+holding the key can run code on a worker: without an explicit key a worker
+only binds a loopback address, under a fixed local key.
+"""
+
+import argparse
+import ipaddress
+import multiprocessing
+import os
+import socket
+import time
+from contextlib import contextmanager
+from multiprocessing.connection import Client, Listener
+
+import numpy as np
+
+from . import distance
+from .engines import FitResult, _cluster_sums, _centers_from_sums, init_centers
+from .streaming import StreamingScaler
+
+# Accepted only on loopback addresses, when no CHURN_SHARD_KEY is set
+LOCAL_AUTHKEY = b'churn-clustering'
+INIT_SAMPLE = 20000
+# Requests a coordinator may make of a worker
+OPERATIONS = {'load', 'load_npy', 'moments', 'sample', 'step', 'get_labels'}
+
+
+class _Shard:
+    # State of one worker: its rows and their current labels
+
+    def __init__(self):
+        self.X = None
+        self.labels = None
+
+    def load(self, X):
+        self.X = np.ascontiguousarray(X)
+        self.labels = np.full(len(self.X), -1, dtype=np.intp)
+        return len(self.X)
+
+    def load_npy(self, path, start, stop):
+        return self.load(np.load(path, mmap_mode='r')[start:stop])
+
+    def moments(self):
+        X = self.X.astype(np.float64, copy=False)
+        if not len(X):
+            return 0, np.zeros(X.shape[1]), np.zeros(X.shape[1])
+        mean = X.mean(axis=0)
+        return len(X), mean, ((X - mean) ** 2).sum(axis=0)
+
+    def sample(self, size, seed):
+        rng = np.random.default_rng(seed)
+        return self.X[np.sort(rng.choice(len(self.X), min(size, len(self.X)), replace=False))]
+
+    def step(self, centers):
+        labels, sq_dist = distance.nearest(self.X, centers)
+        moved = int((labels != self.labels).sum())
+        self.labels = labels
+        sums, counts = _cluster_sums(self.X, labels, None, len(centers))
+        return sums, counts, float(sq_dist.sum()), moved
+
+    def get_labels(self):
+        return self.labels
+
+
+def _authkey(authkey=None):
+    # An explicit key, else CHURN_SHARD_KEY, else None
+    if authkey is not None:
+        return authkey
+    key = os.environ.get('CHURN_SHARD_KEY')
+    return key.encode() if key else None
+
+
+def _is_loopback(address):
+    # Unix socket paths are local; a host name must resolve to loopback addresses only
+    if not isinstance(address, tuple):
+        return True
+    try:
+        infos = socket.getaddrinfo(address[0], None)
+    except socket.gaierror:
+        return False
+    return all(ipaddress.ip_address(info[4][0].split('%')[0]).is_loopback for info in infos)
+
+
+def _handle(conn):
+    # Answer one coordinator until it sends 'close'; errors are returned, not raised
+    shard = _Shard()
+    while True:
+        try:
+            op, *args = conn.recv()
+        except EOFError:
+            return
+        if op == 'close':
+            conn.send(('ok', None))
+            return
+        if op not in OPERATIONS:
+            conn.send(('error', 'unknown operation {!r}'.format(op)))
+            continue
+        try:
+            conn.send(('ok', getattr(shard, op)(*args)))
+        except Exception as exc:
+            conn.send(('error', '{}: {}'.format(type(exc).__name__, exc)))
+
+
+def serve(address=('127.0.0.1', 0), authkey=None, once=False, ready=None):
+    """Run a shard worker, serving coordinators one at a time.
+
+    ``authkey`` defaults to CHURN_SHARD_KEY; without either the worker
+    refuses any address that is not loopback.  ``ready`` (a Connection) is
+    sent the bound address once listening.
+    """
+    key = _authkey(authkey)
+    if key is None:
+        if not _is_loopback(address):
+            raise ValueError('refusing to serve on {} without an authkey: set CHURN_SHARD_KEY'.format(address))
+        key = LOCAL_AUTHKEY
+    with Listener(address, authkey=key) as listener:
+        if ready is not None:
+            ready.send(listener.address)
+            ready.close()
+        while True:
+            with listener.accept() as conn:
+                _handle(conn)
+            if once:
+                return
+
+
+@contextmanager
+def local_workers(n_workers, authkey=None):
+    """Start ``n_workers`` shard workers on localhost; yields their addresses."""
+    processes, addresses = [], []
+    try:
+        for _ in range(n_workers):
+            receive, send = multiprocessing.Pipe(duplex=False)
+            process = multiprocessing.Process(target=serve, kwargs=dict(authkey=authkey, once=True, ready=send),
+                                              daemon=True)
+            process.start()
+            send.close()
+            processes.append(process)
+            addresses.append(receive.recv())
+        yield addresses
+    finally:
+        for process in processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+
+
+class ShardedKMeans:
+    """Coordinator for a fixed set of shard workers, one per address.
+
+    ``authkey`` defaults to CHURN_SHARD_KEY, else the local key of loopback
+    workers.
+    """
+
+    def __init__(self, addresses, authkey=None):
+        key = _authkey(authkey) or LOCAL_AUTHKEY
+        self.connections = [Client(tuple(a) if isinstance(a, list) else a, authkey=key) for a in addresses]
+        self.sizes = None
+
+    def _call(self, op, *args):
+        # Broadcast one request, then collect every reply in shard order
+        return self._scatter(op, [args] * len(self.connections))
+
+    def _scatter(self, op, per_shard):
+        for conn, args in zip(self.connections, per_shard):
+            conn.send((op,) + tuple(args))
+        replies = []
+        for conn in self.connections:
+            status, value = conn.recv()
+            if status == 'error':
+                raise RuntimeError('shard worker failed: ' + value)
+            replies.append(value)
+        return replies
+
+    def load(self, X):
+        """Split ``X`` into contiguous row ranges and send one to each worker."""
+        bounds = np.linspace(0, len(X), len(self.connections) + 1).astype(int)
+        self.sizes = self._scatter('load', [(np.asarray(X[a:b]),) for a, b in zip(bounds[:-1], bounds[1:])])
+        return self
+
+    def load_npy(self, path, n_rows=None):
+        """Have each worker memory-map its row range of a ``.npy`` visible to all of them."""
+        if n_rows is None:
+            n_rows = len(np.load(path, mmap_mode='r'))
+        bounds = np.linspace(0, n_rows, len(self.connections) + 1).astype(int)
+        self.sizes = self._scatter('load_npy', [(os.path.abspath(path), int(a), int(b))
+                                                for a, b in zip(bounds[:-1], bounds[1:])])
+        return self
+
+    def _initial_centers(self, n_clusters, init, random_state):
+        # Explicit centres pass through; otherwise seed from a size-proportional sample of the shards
+        if not isinstance(init, str):
+            return np.array(init)
+        n = sum(self.sizes)
+        rng = np.random.default_rng(random_state)
+        seeds = rng.integers(2 ** 31 - 1, size=len(self.sizes))
+        per_shard = [(int(np.ceil(INIT_SAMPLE * size / n)), int(s)) for size, s in zip(self.sizes, seeds)]
+        sample = np.vstack(self._scatter('sample', per_shard))
+        return init_centers(sample, n_clusters, init, int(rng.integers(2 ** 31 - 1)))
+
+    def fit(self, n_clusters, init='k-means++', random_state=None, max_iter=300, tol=1e-4, return_labels=False):
+        """Lloyd iterations over the shards; returns a FitResult.
+
+        ``labels`` is gathered from the workers only with ``return_labels``.
+        """
+        start = time.perf_counter()
+        if self.sizes is None:
+            raise RuntimeError('load data into the workers first')
+        n = sum(self.sizes)
+        centers = self._initial_centers(n_clusters, init, random_state)
+
+        # Same tolerance as the engines: relative to the mean feature variance
+        moments = StreamingScaler()
+        for count, mean, m2 in self._call('moments'):
+            if count:
+                moments.merge_moments(count, mean, m2)
+        tol = tol * float(np.mean(moments.var_)) if n else 0.0
+
+        shifts = []
+        sums, counts, inertia, moved = self._reduce(centers)
+        n_iter = 0
+        for n_iter in range(1, max_iter + 1):
+            new = _centers_from_sums(sums, counts, centers)
+            shifts.append(float(((new - centers) ** 2).sum()))
+            centers = new
+            sums, counts, inertia, moved = self._reduce(centers)
+            if not moved or shifts[-1] <= tol:
+                break
+
+        labels = np.concatenate(self._call('get_labels')) if return_labels else None
+        distances = np.full(n_iter + 1, n * n_clusters, dtype=np.int64)
+        return FitResult(centers=centers, labels=labels, inertia=inertia, n_iter=n_iter,
+                         seconds=time.perf_counter() - start, distances=distances,
+                         skipped=np.zeros_like(distances), shifts=np.array(shifts))
+
+    def _reduce(self, centers):
+        # One assignment step on every shard, summed in shard order for reproducibility
+        replies = self._call('step', centers)
+        sums = sum(r[0] for r in replies)
+        counts = sum(r[1] for r in replies)
+        return sums, counts, sum(r[2] for r in replies), sum(r[3] for r in replies)
+
+    def close(self):
+        for conn in self.connections:
+            try:
+                conn.send(('close',))
+                conn.recv()
+            except (OSError, EOFError):
+                pass
+            conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Run a shard worker for sharded k-means.')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=6000)
+    args = parser.parse_args(argv)
+    try:
+        serve((args.host, args.port))
+    except ValueError as exc:
+        parser.exit(2, 'error: {}\n'.format(exc))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,156 @@
+"""Bounded-memory silhouette scoring.
+
+``silhouette_score(X_scaled, labels)`` in code.py materialises all pairwise
+distances.  Three replacements are offered:
+
+* ``exact`` streams distance tiles and keeps only per-cluster running sums,
+  so memory is O(block * k) on top of the data; time stays O(n^2).
+* ``sampled`` scores a cluster-stratified sample of rows exactly against all
+  rows, in O(m * n), and returns a confidence interval for the mean.
+* ``simplified`` measures each row against centroids instead of members, in
+  O(n * k).
+
+The sampled and simplified modes are cheap enough to run on every k of the
+sweep.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from scipy.stats import norm
+
+from . import distance
+
+BLOCK = 2048
+
+
+@dataclass
+class SampledScore:
+    score: float
+    low: float
+    high: float
+    n_samples: int
+
+
+def _cluster_distance_sums(rows, X, labels, k, block=BLOCK):
+    # For each row in ``rows``, the summed distance to the members of every cluster
+    sums = np.zeros((len(rows), k))
+    x_norms = np.einsum('ij,ij->i', X, X)
+    for r in range(0, len(rows), block):
+        xr = np.asarray(rows[r:r + block])
+        r_norms = np.einsum('ij,ij->i', xr, xr)
+        for c in range(0, len(X), block):
+            xc = X[c:c + block]
+            d = r_norms[:, None] - 2 * (xr @ xc.T) + x_norms[None, c:c + block]
+            np.sqrt(np.maximum(d, 0, out=d), out=d)
+            # One-hot product turns the tile into per-cluster partial sums
+            onehot = np.zeros((len(xc), k), dtype=X.dtype)
+            onehot[np.arange(len(xc)), labels[c:c + block]] = 1
+            sums[r:r + block] += d @ onehot
+    return sums
+
+
+def _from_sums(sums, own, counts):
+    # Per-row silhouette from per-cluster distance sums; singleton clusters score 0
+    n_own = counts[own]
+    rows = np.arange(len(own))
+    with np.errstate(divide='ignore', invalid='ignore'):
+        a = sums[rows, own] / (n_own - 1)
+        mean_other = sums / counts
+    # Cluster ids with no members are never the nearest other cluster
+    mean_other[:, counts == 0] = np.inf
+    mean_other[rows, own] = np.inf
+    b = mean_other.min(axis=1)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        s = (b - a) / np.maximum(a, b)
+    s[(n_own <= 1) | ~np.isfinite(s)] = 0.0
+    return s
+
+
+def _labels_and_counts(labels, k=None):
+    labels = np.asarray(labels)
+    k = int(labels.max()) + 1 if k is None else k
+    return labels, k, np.bincount(labels, minlength=k).astype(np.float64)
+
+
+def silhouette_samples(X, labels, block=BLOCK):
+    """Exact per-row silhouette values, computed tile by tile."""
+    labels, k, counts = _labels_and_counts(labels)
+    sums = _cluster_distance_sums(X, X, labels, k, block)
+    return _from_sums(sums, labels, counts)
+
+
+def silhouette_exact(X, labels, block=BLOCK):
+    return float(silhouette_samples(X, labels, block).mean())
+
+
+def silhouette_sampled(X, labels, n_samples=2000, confidence=0.95, random_state=None, block=BLOCK):
+    """Estimate the mean silhouette from a cluster-stratified row sample.
+
+    Each cluster contributes rows in proportion to its size; every sampled row
+    is scored exactly against the full data.  The interval uses the
+    stratified-sampling variance with finite-population correction.
+    """
+    labels, k, counts = _labels_and_counts(labels)
+    n = len(labels)
+    if n_samples >= n:
+        s = silhouette_samples(X, labels, block)
+        return SampledScore(float(s.mean()), float(s.mean()), float(s.mean()), n)
+
+    rng = np.random.default_rng(random_state)
+    alloc = np.minimum(np.maximum(np.round(n_samples * counts / n).astype(int), 2), counts.astype(int))
+    order = np.argsort(labels, kind='stable')
+    starts = np.concatenate([[0], np.cumsum(counts.astype(int))])
+    picked = np.concatenate([rng.choice(order[starts[h]:starts[h + 1]], alloc[h], replace=False)
+                             for h in range(k) if alloc[h] > 0])
+    picked.sort()
+
+    sums = _cluster_distance_sums(X[picked], X, labels, k, block)
+    s = _from_sums(sums, labels[picked], counts)
+
+    # Stratified mean and its variance
+    weights = counts / n
+    score = var = 0.0
+    for h in range(k):
+        s_h = s[labels[picked] == h]
+        if len(s_h) == 0:
+            continue
+        score += weights[h] * s_h.mean()
+        if len(s_h) > 1:
+            var += weights[h] ** 2 * s_h.var(ddof=1) / len(s_h) * (1 - len(s_h) / counts[h])
+    half = norm.ppf(0.5 + confidence / 2) * np.sqrt(var)
+    return SampledScore(float(score), float(score - half), float(score + half), int(len(picked)))
+
+
+def silhouette_simplified(X, labels, centers, block=distance.BLOCK):
+    """Simplified silhouette: distances to centroids stand in for mean member distances."""
+    labels = np.asarray(labels)
+    k = len(centers)
+    if k < 2:
+        return float('nan')
+    # Centres of clusters with no members cannot be a row's nearest other cluster
+    empty = np.bincount(labels, minlength=k) == 0
+    total = 0.0
+    for start in range(0, len(X), block):
+        d = np.sqrt(distance.squared_distances(np.asarray(X[start:start + block]), centers))
+        own = labels[start:start + block]
+        rows = np.arange(len(d))
+        a = d[rows, own].copy()
+        d[rows, own] = np.inf
+        d[:, empty] = np.inf
+        b = d.min(axis=1)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            s = (b - a) / np.maximum(a, b)
+        total += np.nan_to_num(s, nan=0.0).sum()
+    return float(total / len(X))
+
+
+def score(X, labels, centers=None, method='simplified', **kwargs):
+    """Dispatch to one of the silhouette modes and return a single float."""
+    if method == 'exact':
+        return silhouette_exact(X, labels, **kwargs)
+    if method == 'sampled':
+        return silhouette_sampled(X, labels, **kwargs).score
+    if method == 'simplified':
+        return silhouette_simplified(X, labels, centers, **kwargs)
+    raise ValueError('unknown silhouette method: {!r}'.format(method))
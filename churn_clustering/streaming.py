@@ -0,0 +1,151 @@
+"""Out-of-core standardization and mini-batch k-means.
+
+The in-memory path in code.py holds the raw frame, ``X_scaled`` and the
+model's own float64 copies at once.  In streaming mode the scaler's mean and
+variance are fitted in one pass over chunks, and MiniBatchKMeans is then fed
+scaled batches read from disk or a memmap, so peak memory follows the batch
+size rather than the row count.
+
+A *source* is either a 2-D array (typically a memmap) or a zero-argument
+callable returning a fresh iterator of chunks, e.g.
+``lambda: ingest.iter_chunks('churn_clean.csv')``.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+
+from . import distance
+
+BATCH_SIZE = 4096
+
+
+def iter_batches(source, batch_size=BATCH_SIZE, dtype=np.float64):
+    # Yield dense row batches of at most ``batch_size`` rows from an array or chunk source
+    chunks = source() if callable(source) else (source,)
+    for chunk in chunks:
+        chunk = chunk.to_numpy(dtype=dtype) if hasattr(chunk, 'to_numpy') else chunk
+        for start in range(0, len(chunk), batch_size):
+            yield np.asarray(chunk[start:start + batch_size], dtype=dtype)
+
+
+class StreamingScaler:
+    """StandardScaler fitted one batch at a time with Chan's parallel update.
+
+    Moments are always accumulated in float64; ``transform`` returns the
+    dtype of its input unless told otherwise.
+    """
+
+    def __init__(self):
+        self.n_samples_seen_ = 0
+        self.mean_ = None
+        self._m2 = None
+
+    def partial_fit(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        n_b = len(X)
+        if n_b == 0:
+            return self
+        mean_b = X.mean(axis=0)
+        m2_b = ((X - mean_b) ** 2).sum(axis=0)
+        return self.merge_moments(n_b, mean_b, m2_b)
+
+    def merge_moments(self, n_b, mean_b, m2_b):
+        # Fold in a batch summarised by its count, mean and sum of squared deviations
+        if self.n_samples_seen_ == 0:
+            self.n_samples_seen_, self.mean_, self._m2 = n_b, np.array(mean_b, dtype=np.float64), \
+                np.array(m2_b, dtype=np.float64)
+            return self
+        n_a = self.n_samples_seen_
+        n = n_a + n_b
+        delta = mean_b - self.mean_
+        self.mean_ = self.mean_ + delta * (n_b / n)
+        self._m2 = self._m2 + m2_b + delta ** 2 * (n_a * n_b / n)
+        self.n_samples_seen_ = n
+        return self
+
+    def fit(self, source, batch_size=BATCH_SIZE):
+        self.n_samples_seen_ = 0
+        for batch in iter_batches(source, batch_size):
+            self.partial_fit(batch)
+        return self
+
+    @property
+    def var_(self):
+        return self._m2 / self.n_samples_seen_
+
+    @property
+    def scale_(self):
+        # Same convention as StandardScaler: constant columns are left unscaled
+        scale = np.sqrt(self.var_)
+        scale[scale == 0] = 1.0
+        return scale
+
+    def transform(self, X, dtype=None):
+        X = np.asarray(X)
+        dtype = dtype or (X.dtype if X.dtype.kind == 'f' else np.float64)
+        return ((X - self.mean_) / self.scale_).astype(dtype, copy=False)
+
+    def to_standard_scaler(self):
+        # An equivalent fitted sklearn StandardScaler, for code that expects one
+        scaler = StandardScaler()
+        scaler.mean_, scaler.var_, scaler.scale_ = self.mean_, self.var_, self.scale_
+        scaler.n_samples_seen_ = self.n_samples_seen_
+        scaler.n_features_in_ = len(self.mean_)
+        return scaler
+
+
+@dataclass
+class StreamingResult:
+    model: MiniBatchKMeans
+    scaler: StreamingScaler
+    inertia: float
+
+
+def streaming_inertia(source, centers, scaler=None, batch_size=BATCH_SIZE):
+    # Sum of squared distances to the nearest centre, computed in one pass over batches
+    total = 0.0
+    for batch in iter_batches(source, batch_size):
+        if scaler is not None:
+            batch = scaler.transform(batch)
+        total += distance.nearest(batch, centers)[1].sum()
+    return total
+
+
+def fit_minibatch(source, n_clusters, scaler=None, batch_size=BATCH_SIZE, n_epochs=1, random_state=None):
+    """Standardize and cluster ``source`` without materialising it.
+
+    Pass an already-fitted ``scaler`` (or None to fit one with an extra pass);
+    pass ``scaler=False`` when the source is already standardized.
+    """
+    if scaler is None:
+        scaler = StreamingScaler().fit(source, batch_size)
+    model = MiniBatchKMeans(n_clusters=n_clusters, batch_size=batch_size, random_state=random_state,
+                            n_init=3)
+    pending = None
+    for _ in range(n_epochs):
+        for batch in iter_batches(source, batch_size):
+            if scaler:
+                batch = scaler.transform(batch)
+            # partial_fit needs at least k rows; carry short tail batches over
+            if pending is not None:
+                batch, pending = np.vstack([pending, batch]), None
+            if len(batch) < n_clusters:
+                pending = batch
+                continue
+            model.partial_fit(batch)
+    inertia = streaming_inertia(source, model.cluster_centers_, scaler or None, batch_size)
+    return StreamingResult(model=model, scaler=scaler or None, inertia=inertia)
+
+
+def compare_to_full(X_scaled, result, random_state=None):
+    """Compare a streaming fit with a full-batch KMeans for the same k.
+
+    Returns the two inertias and the relative gap ``streaming / full - 1``.
+    """
+    full = KMeans(n_clusters=result.model.n_clusters, random_state=random_state).fit(X_scaled)
+    return {'k': result.model.n_clusters, 'full_inertia': float(full.inertia_),
+            'streaming_inertia': float(result.inertia),
+            'relative_gap': float(result.inertia / full.inertia_ - 1)}
@@ -0,0 +1,124 @@
+"""Parallel, optionally warm-started k sweep used to pick the number of clusters.
+
+Replaces the elbow loop in code.py, which refits every k from scratch in
+sequence.  k values are fanned out over a process pool that shares a single
+read-only copy of ``X_scaled``.  With ``warm_start`` each worker walks a
+contiguous run of k values and seeds k+1 from the k solution plus one new
+centre drawn k-means++ style.  ``silhouette`` adds a per-k score using one
+of the sub-quadratic modes from the silhouette module.  ``sample_weight``
+makes every fit weighted, e.g. to sweep a coreset; the silhouette is then
+taken over the weighted points without their weights.  Each k's fit is
+recorded with the active tracer as ``sweep.k<k>``, from the parent process
+once the workers return.
+"""
+
+import time
+from dataclasses import dataclass, field, replace
+
+import numpy as np
+from . import distance, parallel
+from .engines import get_engine
+from .instrument import get_tracer
+from .silhouette import score as silhouette_score
+
+
+@dataclass
+class SweepResult:
+    kvalues: np.ndarray
+    inertia: np.ndarray
+    n_iter: np.ndarray
+    seconds: np.ndarray
+    silhouette: np.ndarray
+    centers: list = field(repr=False)
+
+
+def _next_centers(X, centers, rng, weights=None):
+    # Add one centre to a k solution, chosen with probability proportional to (weighted) D^2
+    d2 = distance.nearest(X, centers)[1]
+    if weights is not None:
+        d2 = d2 * weights
+    total = d2.sum()
+    if total <= 0:
+        new = X[rng.integers(len(X))]
+    else:
+        new = X[rng.choice(len(X), p=d2 / total)]
+    return np.vstack([centers, new])
+
+
+def _run_chain(X, ks, seeds, warm_start, params, silhouette, weights=None):
+    # Fit each k in ``ks`` in order; returns one record per k
+    records = []
+    centers = None
+    engine = get_engine(params['engine'], max_iter=params['max_iter'], tol=params['tol'])
+    for k, seed in zip(ks, seeds):
+        start = time.perf_counter()
+        init = 'k-means++'
+        if warm_start and centers is not None and len(centers) == k - 1:
+            init = _next_centers(X, centers, np.random.default_rng(seed), weights)
+        fitted = engine.fit(X, k, init=init, random_state=seed, sample_weight=weights)
+        centers = fitted.centers
+        seconds = time.perf_counter() - start
+        score = np.nan
+        if silhouette and k > 1:
+            extra = {'random_state': seed} if silhouette == 'sampled' else {}
+            score = silhouette_score(X, fitted.labels, centers, method=silhouette, **extra)
+        # The FitResult travels back without its labels, only for the tracer
+        records.append((k, fitted.inertia, fitted.n_iter, seconds, score, centers, replace(fitted, labels=None)))
+    return records
+
+
+def _pool_chain(ks, seeds, warm_start, params, silhouette, weights=None):
+    return _run_chain(parallel.worker_array(), ks, seeds, warm_start, params, silhouette, weights)
+
+
+def _chains(kvalues, seeds, warm_start, n_jobs):
+    # Independent fits get one task per k; warm starts need contiguous runs of k
+    if not warm_start:
+        return [([k], [s]) for k, s in zip(kvalues, seeds)]
+    bounds = np.linspace(0, len(kvalues), n_jobs + 1).astype(int)
+    return [(kvalues[a:b], seeds[a:b]) for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def sweep(X, kvalues=range(1, 11), n_jobs=None, warm_start=False, random_state=None,
+          max_iter=300, tol=1e-4, silhouette=None, engine='sklearn', sample_weight=None):
+    """Fit k-means for every k in ``kvalues``.
+
+    Returns a SweepResult whose ``inertia``, ``n_iter`` and ``seconds`` arrays
+    are aligned with the sorted ``kvalues``.  ``n_jobs=1`` runs in-process.
+    ``silhouette`` is None or one of 'simplified', 'sampled' or 'exact'; the
+    score is NaN for k=1.  ``engine`` names a backend from the engines module.
+    With ``sample_weight`` the inertias are weighted.
+    """
+    X = np.ascontiguousarray(X)
+    weights = None if sample_weight is None else np.asarray(sample_weight, dtype=np.float64)
+    kvalues = [int(k) for k in np.sort(np.asarray(list(kvalues)))]
+    seeds = [int(s) for s in np.random.default_rng(random_state).integers(2 ** 31 - 1, size=len(kvalues))]
+    params = dict(max_iter=max_iter, tol=tol, engine=engine)
+
+    # Preallocate the per-k outputs
+    n = len(kvalues)
+    result = SweepResult(kvalues=np.array(kvalues), inertia=np.empty(n), n_iter=np.empty(n, dtype=np.int64),
+                         seconds=np.empty(n), silhouette=np.full(n, np.nan), centers=[None] * n)
+    position = {k: i for i, k in enumerate(kvalues)}
+
+    n_jobs = parallel.resolve_jobs(n_jobs, n)
+    chains = _chains(kvalues, seeds, warm_start, n_jobs)
+    if n_jobs == 1:
+        batches = [_run_chain(X, ks, ss, warm_start, params, silhouette, weights) for ks, ss in chains]
+    else:
+        with parallel.SharedArray(X) as shared, parallel.shared_pool(shared, n_jobs) as pool:
+            futures = [pool.submit(_pool_chain, ks, ss, warm_start, params, silhouette, weights)
+                       for ks, ss in chains]
+            batches = [f.result() for f in futures]
+
+    tracer = get_tracer()
+    for records in batches:
+        for k, inertia, n_iter, seconds, score, centers, fitted in records:
+            tracer.record_fit('sweep.k{}'.format(k), fitted)
+            i = position[k]
+            result.inertia[i] = inertia
+            result.n_iter[i] = n_iter
+            result.seconds[i] = seconds
+            result.silhouette[i] = score
+            result.centers[i] = centers
+    return result
@@ -226,7 +226,7 @@ for i in kvalues:
 # Create a figure containing a single axes.
 fig, ax = plt.subplots()
 # Plot the kvalue and inertia data on the axes.
-ax.plot(inertia, kvalues);
+ax.plot(kvalues, inertia);
 
 
 # ---
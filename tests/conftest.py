@@ -0,0 +1,24 @@
+import os
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+# Appended, not prepended: the repository's code.py would otherwise shadow the standard library's code module
+sys.path.append(ROOT)
+
+from churn_clustering import COLUMNS  # noqa: E402
+
+
+@pytest.fixture(scope='session')
+def source():
+    """Path to the churn export shipped with the repository."""
+    return os.path.join(ROOT, 'churn_clean.csv')
+
+
+@pytest.fixture(scope='session')
+def X_scaled(source):
+    X = pd.read_csv(source, usecols=COLUMNS).to_numpy(dtype=np.float64)
+    return (X - X.mean(axis=0)) / X.std(axis=0)
@@ -0,0 +1,23 @@
+import os
+
+from churn_clustering.cache import MISSING, ArtifactCache
+
+
+def test_stale_pickle_is_a_miss(tmp_path):
+    cache = ArtifactCache(str(tmp_path))
+    path = os.path.join(cache.directory, 'stale.pkl')
+    # A pickle of a class whose module no longer exists
+    with open(path, 'wb') as f:
+        f.write(b'cno_such_module\nGone\n.')
+    assert cache.get('stale') is MISSING
+    assert not os.path.exists(path)
+    cache.put('stale', {'fresh': 1})
+    assert cache.get('stale') == {'fresh': 1}
+
+
+def test_oversized_artifact_keeps_the_rest(tmp_path):
+    cache = ArtifactCache(str(tmp_path), max_bytes=10000)
+    cache.put('small', list(range(100)))
+    assert not cache.put('big', bytes(20000))
+    assert cache.get('big') is MISSING
+    assert cache.get('small') == list(range(100))
@@ -0,0 +1,26 @@
+import numpy as np
+import pandas as pd
+
+from churn_clustering import churn, ingest
+
+
+def test_breakdowns_count_every_customer(tmp_path, source):
+    k = 4
+    labels = np.random.default_rng(0).integers(0, k, size=len(pd.read_csv(source, usecols=[ingest.INDEX])))
+    index, data = ingest.load_codes(source, [churn.CHURN] + churn.CATEGORICAL, str(tmp_path))
+    sizes = np.bincount(labels, minlength=k)
+    assert 'None' in data['InternetService'][1]
+    for column in churn.CATEGORICAL:
+        counts = churn.breakdown(labels, *data[column], k=k, normalize=False)
+        np.testing.assert_array_equal(counts.sum(axis=1), sizes, err_msg=column)
+    tables = churn.report(labels, source, cache_dir=str(tmp_path), k=k)
+    np.testing.assert_array_equal(tables['churn']['customers'].iloc[:k], sizes)
+
+
+def test_only_empty_cells_are_missing(tmp_path):
+    path = tmp_path / 'churn.csv'
+    pd.DataFrame({ingest.INDEX: [1, 2, 3, 4], 'Churn': ['Yes', 'No', 'No', 'Yes'],
+                  'InternetService': ['None', 'NA', '', 'DSL']}).to_csv(path, index=False)
+    _, data = ingest.load_codes(str(path), ['Churn', 'InternetService'], str(tmp_path / 'cache'))
+    codes, levels = data['InternetService']
+    assert [levels[c] if c >= 0 else None for c in codes] == ['None', 'NA', None, 'DSL']
@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+from churn_clustering import coreset, distance
+from churn_clustering.engines import get_engine, init_centers
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_weights_sum_to_the_row_count(X_scaled, seed):
+    sample = coreset.build(X_scaled, size=2000, random_state=seed)
+    n = len(X_scaled)
+    assert sample.n_source == n
+    assert sample.weights.sum() == pytest.approx(n, rel=0.08)
+    assert len(sample.points) == pytest.approx(2000, rel=0.1)
+    np.testing.assert_array_equal(sample.points, X_scaled[sample.indices])
+
+
+def test_weighted_cost_estimates_the_full_cost(X_scaled):
+    centers = get_engine('lloyd').fit(X_scaled, 4, init=init_centers(X_scaled, 4, 'k-means++', 0)).centers
+    _, full = coreset.assign(X_scaled, centers)
+    estimates = []
+    for seed in range(10):
+        sample = coreset.build(X_scaled, size=1000, random_state=seed)
+        _, sq_dist = distance.nearest(sample.points, centers)
+        estimates.append(np.dot(sample.weights, sq_dist))
+    assert np.mean(estimates) == pytest.approx(full, rel=0.03)
+
+
+def test_batching_does_not_change_the_sample(X_scaled):
+    whole = coreset.build(X_scaled, size=500, random_state=3, batch_size=len(X_scaled))
+    chunked = coreset.build(X_scaled, size=500, random_state=3, batch_size=777)
+    np.testing.assert_array_equal(chunked.indices, whole.indices)
+    np.testing.assert_allclose(chunked.weights, whole.weights, rtol=1e-12)
+
+
+def test_size_above_n_keeps_every_row():
+    X = np.random.default_rng(0).normal(size=(300, 3))
+    sample = coreset.build(X, size=10000, random_state=0)
+    np.testing.assert_array_equal(sample.indices, np.arange(300))
+    np.testing.assert_array_equal(sample.weights, 1.0)
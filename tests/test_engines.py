@@ -0,0 +1,50 @@
+import numpy as np
+import pytest
+
+from churn_clustering import engines
+from churn_clustering.engines import get_engine, init_centers
+
+
+@pytest.mark.parametrize('k', [1, 4, 10])
+@pytest.mark.parametrize('name', ['elkan', 'hamerly'])
+def test_pruned_engines_match_lloyd(X_scaled, name, k):
+    init = init_centers(X_scaled, k, 'k-means++', 0)
+    expected = get_engine('lloyd').fit(X_scaled, k, init=init)
+    result = get_engine(name, block=1000).fit(X_scaled, k, init=init)
+    np.testing.assert_array_equal(result.labels, expected.labels)
+    np.testing.assert_allclose(result.centers, expected.centers, rtol=1e-10, atol=1e-12)
+    assert result.n_iter == expected.n_iter
+    assert result.inertia == pytest.approx(expected.inertia, rel=1e-12)
+
+
+@pytest.mark.parametrize('name', ['lloyd', 'elkan', 'hamerly'])
+def test_distances_count_the_work_done(X_scaled, name, monkeypatch):
+    # Count every row-to-centre distance the engine evaluates, leaving out centre-to-centre geometry
+    counted = []
+    squared_distances, row_distances = engines.distance.squared_distances, engines._row_distances
+
+    def counting_squared(X, C):
+        if X is not C:
+            counted.append(len(X) * len(C))
+        return squared_distances(X, C)
+
+    def counting_rows(xs, cs):
+        counted.append(len(xs))
+        return row_distances(xs, cs)
+    monkeypatch.setattr(engines.distance, 'squared_distances', counting_squared)
+    monkeypatch.setattr(engines, '_row_distances', counting_rows)
+    n, k = len(X_scaled), 6
+    result = get_engine(name).fit(X_scaled, k, init=init_centers(X_scaled, k, 'k-means++', 0))
+    assert sum(counted) == result.distances.sum()
+    np.testing.assert_array_equal(result.distances + result.skipped, n * k)
+    assert len(result.distances) == result.n_iter + 1
+    assert result.distances[0] == n * k
+    if name == 'lloyd':
+        assert not result.skipped.any()
+    else:
+        assert result.skipped[1:].sum() > 0.5 * n * k * result.n_iter
+
+
+def test_sklearn_hides_its_steps(X_scaled):
+    result = get_engine('sklearn').fit(X_scaled, 4, init=init_centers(X_scaled, 4, 'k-means++', 0))
+    assert result.distances is None and result.skipped is None and result.shifts is None
@@ -0,0 +1,83 @@
+import warnings
+
+import numpy as np
+import pytest
+
+from churn_clustering.incremental import IncrementalModel
+
+COLUMNS = ['a', 'b', 'c']
+
+
+@pytest.fixture
+def blobs():
+    rng = np.random.default_rng(0)
+    offsets = np.array([[0.0, 0.0, 0.0], [20.0, 0.0, 5.0], [0.0, 30.0, -5.0]])
+    labels = np.repeat(np.arange(3), 200)
+    return offsets[labels] + rng.normal(size=(600, 3)), labels
+
+
+def _model(X, labels, decay):
+    return IncrementalModel.from_fit(X, labels, 3, columns=COLUMNS, decay=decay, drift_threshold=np.inf)
+
+
+def _raw_centers(model):
+    return model.centers * model.scale + model.mean
+
+
+@pytest.mark.parametrize('decay', [1.0, 0.5])
+def test_removing_a_delta_restores_the_training_fit(blobs, decay):
+    X, labels = blobs
+    model = _model(X, labels, decay)
+    expected_mean, expected_scale, expected_centers = model.mean, model.scale, model.centers
+    added = model.update(X[::3] + 1.0)
+    model.update(np.empty((0, 3)), X[::3] + 1.0, added.labels, periods_left=added.period)
+    assert model.weight == pytest.approx(decay ** 2 * len(X))
+    np.testing.assert_allclose(model.mean, expected_mean, atol=1e-9)
+    np.testing.assert_allclose(model.scale, expected_scale, rtol=1e-9)
+    np.testing.assert_allclose(model.centers, expected_centers, atol=1e-9)
+
+
+def test_decayed_weights_match_a_weighted_fit(blobs):
+    X, labels = blobs
+    model = _model(X, labels, 0.5)
+    new = X[:50] + 0.5
+    added = model.update(new)
+    left = np.arange(200, 260)
+    model.update(np.empty((0, 3)), X[left], labels[left], periods_left=0)
+    # Training rows now weigh 0.25, the first delta 0.5, and the departed rows nothing
+    kept = np.setdiff1d(np.arange(len(X)), left)
+    rows = np.vstack([X[kept], new])
+    weights = np.r_[np.full(len(kept), 0.25), np.full(len(new), 0.5)]
+    row_labels = np.r_[labels[kept], added.labels]
+    mean = np.average(rows, axis=0, weights=weights)
+    assert model.weight == pytest.approx(weights.sum())
+    np.testing.assert_allclose(model.mean, mean, atol=1e-9)
+    np.testing.assert_allclose(model.scale, np.sqrt(np.average((rows - mean) ** 2, axis=0, weights=weights)),
+                               rtol=1e-9)
+    for c in range(3):
+        members = row_labels == c
+        np.testing.assert_allclose(_raw_centers(model)[c],
+                                   np.average(rows[members], axis=0, weights=weights[members]), atol=1e-9)
+
+
+@pytest.mark.parametrize('decay', [1.0, 0.7])
+def test_emptied_cluster_keeps_its_last_centroid(blobs, decay, tmp_path):
+    X, labels = blobs
+    model = _model(X, labels, decay)
+    before = _raw_centers(model)[1]
+    with warnings.catch_warnings():
+        warnings.simplefilter('error')
+        model.update(np.empty((0, 3)), X[labels == 1], labels[labels == 1], periods_left=0)
+        centers = _raw_centers(model)
+    assert model.counts[1] == 0
+    assert np.isfinite(model.centers).all()
+    np.testing.assert_allclose(centers[1], before, atol=1e-6)
+    model.save(tmp_path / 'model.npz')
+    np.testing.assert_allclose(IncrementalModel.load(tmp_path / 'model.npz').centers, model.centers)
+
+
+def test_removal_must_name_an_earlier_period(blobs):
+    X, labels = blobs
+    model = _model(X, labels, 0.9)
+    with pytest.raises(ValueError, match='periods_left'):
+        model.update(np.empty((0, 3)), X[:5], labels[:5], periods_left=1)
@@ -0,0 +1,22 @@
+import json
+
+import pytest
+
+from churn_clustering import instrument
+from churn_clustering.engines import get_engine, init_centers
+
+
+@pytest.mark.parametrize('name', ['lloyd', 'sklearn'])
+def test_record_fit_says_whether_steps_were_reported(X_scaled, name, tmp_path):
+    tracer = instrument.Tracer()
+    result = get_engine(name).fit(X_scaled, 4, init=init_centers(X_scaled, 4, 'k-means++', 0))
+    tracer.record_fit('fit', result)
+    iterations = [r for r in tracer.records if r['name'] == 'fit.iteration']
+    converged, = [r for r in tracer.records if r['name'] == 'fit.converged']
+    if name == 'sklearn':
+        assert not iterations and converged['attrs']['steps_reported'] is False
+    else:
+        assert len(iterations) == result.n_iter + 1 and converged['attrs']['steps_reported'] is True
+    tracer.write_chrome(tmp_path / 'trace.json')
+    counters = [e for e in json.loads((tmp_path / 'trace.json').read_text())['traceEvents'] if e['ph'] == 'C']
+    assert len(counters) == len(iterations)
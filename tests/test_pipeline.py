@@ -0,0 +1,47 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from churn_clustering import pipeline
+from churn_clustering.cache import ArtifactCache
+
+
+@pytest.fixture
+def small_source(tmp_path, source):
+    path = tmp_path / 'churn.csv'
+    pd.read_csv(source, nrows=3000).to_csv(path, index=False)
+    return str(path)
+
+
+def _pipeline(tmp_path, path, **kwargs):
+    return pipeline.Pipeline(path, cache=ArtifactCache(str(tmp_path / 'artifacts')),
+                             ingest_cache=str(tmp_path / 'ingest'), kvalues=range(1, 5), random_state=0,
+                             engine='lloyd', **kwargs)
+
+
+def test_second_run_fits_nothing(tmp_path, small_source, monkeypatch):
+    first = _pipeline(tmp_path, small_source)
+    expected = first.run()
+    expected_labels = first.labels()
+    assert {'sweep', 'fit', 'projection', 'silhouette'} <= set(first.computed)
+
+    def no_model(*args, **kwargs):
+        raise AssertionError('model fitted on a cached run')
+    monkeypatch.setattr(pipeline, 'sweep', no_model)
+    monkeypatch.setattr(pipeline, 'fit_restarts', no_model)
+    monkeypatch.setattr(pipeline, 'silhouette_score', no_model)
+    second = _pipeline(tmp_path, small_source)
+    result = second.run()
+    # Only the memory-mapped matrix and the one nearest-centroid labelling pass are rebuilt
+    assert second.computed == ['ingest', 'labels']
+    np.testing.assert_array_equal(second.labels(), expected_labels)
+    assert result['fit']['inertia'] == expected['fit']['inertia']
+    assert result['silhouette'] == expected['silhouette']
+
+
+def test_parameter_change_refits_downstream_only(tmp_path, small_source):
+    _pipeline(tmp_path, small_source).run()
+    changed = _pipeline(tmp_path, small_source, n_clusters=3)
+    changed.run()
+    assert 'sweep' not in changed.computed
+    assert {'fit', 'labels', 'projection', 'silhouette'} <= set(changed.computed)
@@ -0,0 +1,24 @@
+import numpy as np
+import pytest
+
+from churn_clustering import prepared
+
+
+def _save(directory, X):
+    return prepared.save(directory, X, X.mean(axis=0), X.std(axis=0), ['a', 'b'])
+
+
+def test_save_replaces_previous_export(tmp_path):
+    directory = tmp_path / 'prepared'
+    _save(directory, np.zeros((3, 2)))
+    _save(directory, np.ones((5, 2)))
+    data = prepared.load(directory)
+    np.testing.assert_array_equal(data.X_scaled, np.ones((5, 2)))
+    assert sorted(p.name for p in tmp_path.iterdir()) == ['prepared']
+
+
+def test_save_refuses_unrelated_directory(tmp_path):
+    (tmp_path / 'notes.txt').write_text('keep me')
+    with pytest.raises(FileExistsError):
+        _save(tmp_path, np.zeros((3, 2)))
+    assert (tmp_path / 'notes.txt').read_text() == 'keep me'
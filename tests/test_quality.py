@@ -0,0 +1,29 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from churn_clustering import COLUMNS, ingest
+from churn_clustering.quality import Profile
+
+
+@pytest.mark.parametrize('chunksize', [1, 37, 1000, 100000])
+def test_duplicates_match_pandas(chunksize):
+    rng = np.random.default_rng(0)
+    X = rng.integers(0, 4, size=(5000, 3)).astype(np.float64)
+    X[rng.random(X.shape) < 0.05] = np.nan
+    profile = Profile(['a', 'b', 'c'])
+    for start in range(0, len(X), chunksize):
+        profile.update(X[start:start + chunksize])
+    assert profile.finish().duplicates == pd.DataFrame(X).duplicated().sum()
+
+
+def test_duplicates_match_pandas_on_export(tmp_path, source):
+    frame = pd.read_csv(source, index_col=[0])
+    # Repeat every seventh customer at the end so duplicates span many chunks
+    frame = pd.concat([frame, frame.iloc[::7]])
+    frame.index = pd.RangeIndex(1, len(frame) + 1, name=ingest.INDEX)
+    path = tmp_path / 'churn.csv'
+    frame.to_csv(path)
+    profile = Profile(COLUMNS)
+    ingest.load_matrix(path, COLUMNS, cache_dir=None, chunksize=1000, profile=profile)
+    assert profile.finish().duplicates == frame[COLUMNS].duplicated().sum() > 0
@@ -0,0 +1,33 @@
+import numpy as np
+import pytest
+
+from churn_clustering import restarts
+
+
+@pytest.mark.parametrize('engine', ['lloyd', 'hamerly'])
+def test_result_does_not_depend_on_n_jobs(X_scaled, engine):
+    X = X_scaled[:4000]
+    serial = restarts.fit(X, 4, n_init=4, engine=engine, n_jobs=1, random_state=0)
+    pooled = restarts.fit(X, 4, n_init=4, engine=engine, n_jobs=3, random_state=0)
+    np.testing.assert_array_equal(pooled.seeds, serial.seeds)
+    np.testing.assert_array_equal(pooled.inertia, serial.inertia)
+    assert pooled.best == serial.best == int(np.argmin(serial.inertia))
+    np.testing.assert_array_equal(pooled.fit.centers, serial.fit.centers)
+    np.testing.assert_array_equal(pooled.fit.labels, serial.fit.labels)
+
+
+def test_clusters_are_numbered_largest_first(X_scaled):
+    result = restarts.fit(X_scaled[:4000], 4, n_init=3, n_jobs=1, random_state=1).fit
+    sizes = np.bincount(result.labels, minlength=4)
+    assert (np.diff(sizes) <= 0).all()
+    # Renumbering moves whole clusters: every row is still nearest its own centroid
+    d = ((X_scaled[:4000, None, :] - result.centers[None]) ** 2).sum(axis=2)
+    np.testing.assert_array_equal(d.argmin(axis=1), result.labels)
+
+
+def test_canonical_order_breaks_size_ties_by_centroid():
+    centers = np.array([[1.0, 0.0], [0.0, 5.0], [0.0, 1.0]])
+    labels = np.array([0, 1, 2, 0, 1, 2])
+    ordered, relabelled = restarts.canonical_order(centers, labels)
+    np.testing.assert_array_equal(ordered, centers[[2, 1, 0]])
+    np.testing.assert_array_equal(relabelled, [2, 1, 0, 2, 1, 0])
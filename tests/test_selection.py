@@ -0,0 +1,47 @@
+import numpy as np
+import pytest
+
+from churn_clustering import selection
+from churn_clustering.sweep import sweep
+
+
+@pytest.fixture(scope='module')
+def blobs():
+    rng = np.random.default_rng(0)
+    offsets = rng.uniform(-10, 10, size=(3, 4))
+    return offsets[np.repeat(np.arange(3), 400)] + rng.normal(size=(1200, 4))
+
+
+@pytest.fixture(scope='module')
+def swept(blobs):
+    return sweep(blobs, range(1, 7), n_jobs=1, random_state=0, silhouette='simplified', engine='lloyd')
+
+
+def test_every_criterion_finds_separated_blobs(blobs, swept):
+    chosen = selection.select_k(blobs, swept, n_references=5, reference_size=1200, n_jobs=1, random_state=0)
+    assert chosen.k == 3
+    assert chosen.votes == {'knee': 3, 'ch': 3, 'db': 3, 'silhouette': 3, 'gap': 3}
+    assert list(chosen.table.index) == list(range(1, 7))
+    assert chosen.table.loc[3, 'votes'] == 5
+    assert 'recommended k=3' in chosen.summary()
+
+
+def test_gap_does_not_depend_on_n_jobs(blobs, swept):
+    serial = selection.select_k(blobs, swept, n_references=4, reference_size=500, n_jobs=1, random_state=0)
+    pooled = selection.select_k(blobs, swept, n_references=4, reference_size=500, n_jobs=2, random_state=0)
+    np.testing.assert_array_equal(pooled.table['gap'], serial.table['gap'])
+
+
+def test_weights_count_like_repeated_rows(blobs, swept):
+    weights = np.tile([1.0, 2.0], len(blobs) // 2)
+    repeated = np.repeat(blobs, weights.astype(int), axis=0)
+    for centers in swept.centers[1:]:
+        np.testing.assert_allclose(selection.internal_indices(blobs, centers, weights),
+                                   selection.internal_indices(repeated, centers), rtol=1e-10)
+
+
+def test_gap_and_knee_picks():
+    kvalues = np.arange(1, 6)
+    assert selection._gap_choice(kvalues, np.array([1.0, 2.0, 1.9, 3.0, 2.0]), np.full(5, 0.2)) == 2
+    assert selection._gap_choice(kvalues, np.arange(5.0), np.zeros(5)) == 5
+    assert selection.knee(kvalues, [100.0, 30.0, 20.0, 15.0, 12.0])[1] == 2
@@ -0,0 +1,96 @@
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from churn_clustering import serve
+
+
+@pytest.fixture
+def model():
+    return serve.ScoringModel(columns=['a', 'b'], mean=np.zeros(2), scale=np.ones(2),
+                              centers=np.array([[0.0, 0.0], [10.0, 10.0]]))
+
+
+def _exchange(model, request):
+    # Send one raw request and read the response until the server closes the connection
+    async def run():
+        server = serve.ScoringServer(model)
+        host, port = await server.start(port=0)
+        try:
+            reader, writer = await asyncio.open_connection(host, port)
+            writer.write(request)
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+        finally:
+            await server.stop()
+        head, _, body = response.partition(b'\r\n\r\n')
+        return int(head.split(b' ', 2)[1]), head.decode('latin-1'), body
+    return asyncio.run(run())
+
+
+def _post(path, body, headers=None):
+    headers = {'Content-Length': str(len(body)), 'Connection': 'close'} if headers is None else headers
+    head = ''.join('{}: {}\r\n'.format(name, value) for name, value in headers.items())
+    return 'POST {} HTTP/1.1\r\n{}\r\n'.format(path, head).encode('latin-1') + body
+
+
+def _dechunk(body):
+    # Chunk payloads, and whether the terminating zero-length chunk arrived
+    pieces = []
+    while body:
+        size, _, body = body.partition(b'\r\n')
+        if int(size, 16) == 0:
+            return b''.join(pieces), True
+        pieces.append(body[:int(size, 16)])
+        body = body[int(size, 16) + 2:]
+    return b''.join(pieces), False
+
+
+def test_score_rows_and_records(model):
+    status, _, body = _exchange(model, _post('/score', b'{"rows": [[1, 1], [9, 9]]}'))
+    assert status == 200 and json.loads(body) == {'labels': [0, 1]}
+    status, _, body = _exchange(model, _post('/score', b'{"records": [{"b": 8, "a": 9}]}'))
+    assert status == 200 and json.loads(body) == {'labels': [1]}
+
+
+@pytest.mark.parametrize('request_bytes, status', [
+    (_post('/score', b'{"rows": [[1, 1'), 400),
+    (_post('/score', b'{"rows": [[1, 1, 1]]}'), 400),
+    (_post('/score', b'{"records": [{"a": 1}]}'), 400),
+    (_post('/score', b'{}', {'Content-Length': 'abc'}), 400),
+    (_post('/score', b'{}', {'Content-Length': '-5'}), 400),
+    (_post('/score', b'zz\r\n{}\r\n0\r\n\r\n', {'Transfer-Encoding': 'chunked'}), 400),
+    (_post('/score', b'{}', {}), 411),
+    (b'GET /score HTTP/1.1\r\n\r\n', 405),
+    (b'GET /nowhere HTTP/1.1\r\n\r\n', 404),
+    (b'garbage\r\n\r\n', 400),
+])
+def test_score_errors_close_the_connection(model, request_bytes, status):
+    got, head, body = _exchange(model, request_bytes)
+    assert got == status
+    assert 'Connection: close' in head
+    assert 'error' in json.loads(body)
+
+
+def test_score_csv_streams_labels(model):
+    status, head, body = _exchange(model, _post('/score-csv', b'id,b,a\nx,1,1\ny,9,9\nz,0,0'))
+    assert status == 200 and 'Transfer-Encoding: chunked' in head
+    assert _dechunk(body) == (b'id,cluster\nx,0\ny,1\nz,0\n', True)
+
+
+@pytest.mark.parametrize('body', [b'', b'id,a\nx,1\n', b'id,a,b\nx,1,oops\n', b'id,a,b\nx,1\n'])
+def test_score_csv_rejects_a_bad_start(model, body):
+    status, _, response = _exchange(model, _post('/score-csv', body))
+    assert status == 400 and 'error' in json.loads(response)
+
+
+def test_score_csv_bad_row_after_streaming_starts(model, monkeypatch):
+    monkeypatch.setattr(serve, 'CSV_BATCH', 2)
+    status, _, body = _exchange(model, _post('/score-csv', b'id,a,b\nx,1,1\ny,9,9\nz,oops,0\n'))
+    assert status == 200
+    text, terminated = _dechunk(body)
+    assert not terminated
+    assert text.startswith(b'id,cluster\nx,0\ny,1\nerror: bad CSV row after line 3')
@@ -0,0 +1,23 @@
+import numpy as np
+import pytest
+
+from churn_clustering import sharded
+from churn_clustering.engines import get_engine, init_centers
+
+
+def test_sharded_fit_matches_single_process(X_scaled):
+    init = init_centers(X_scaled, 4, 'k-means++', 0)
+    expected = get_engine('lloyd').fit(X_scaled, 4, init=init)
+    with sharded.local_workers(3) as addresses:
+        with sharded.ShardedKMeans(addresses) as model:
+            result = model.load(X_scaled).fit(4, init=init, return_labels=True)
+    np.testing.assert_allclose(result.centers, expected.centers, rtol=1e-10, atol=1e-12)
+    assert result.inertia == pytest.approx(expected.inertia, rel=1e-12)
+    assert result.n_iter == expected.n_iter
+    np.testing.assert_array_equal(result.labels, expected.labels)
+
+
+def test_refuses_public_address_without_key(monkeypatch):
+    monkeypatch.delenv('CHURN_SHARD_KEY', raising=False)
+    with pytest.raises(ValueError, match='CHURN_SHARD_KEY'):
+        sharded.serve(('0.0.0.0', 0), once=True)